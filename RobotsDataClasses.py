@@ -1,14 +1,22 @@
 from datetime import datetime
-from dataclasses import dataclass, field, is_dataclass, asdict
-from typing import Literal, Any, Optional, Union
-from types import SimpleNamespace
+from dataclasses import dataclass, field, fields, is_dataclass
+from typing import Literal, Any, Optional, Union, NamedTuple, ClassVar
+from types import SimpleNamespace, MappingProxyType
+from array import array
 from itertools import count
 import reMe
 import re
 import rfcRegexes
+import uriScanner
 import json
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
+# Levels of the nested revealedPathTree json, deeper segments are only kept in the PathTrie
 MAX_PATH_DEPTH = 100
+JSON_BACKENDS = ("json", "orjson")
 
 def load_json_string(s: str):
     return json.loads(s, object_hook=lambda d: SimpleNamespace(**d))
@@ -19,19 +27,56 @@ regexStore = {
 }
 
 
+# Field names per dataclass, for shallow conversion
+_dataclass_fields = dict()
+
+
+def json_default(o):
+    # Shallow conversion, the encoder walks whatever is returned itself,
+    #   so nothing gets deep copied like dataclasses.asdict does
+    if is_dataclass(o):
+        names = _dataclass_fields.get(type(o))
+        if names is None:
+            names = _dataclass_fields[type(o)] = tuple(f.name for f in fields(o))
+        return {name: getattr(o, name) for name in names}
+    elif isinstance(o, set):
+        # Sorted so the output doesn't depend on the process' hash seed
+        try:
+            return sorted(o)
+        except TypeError:
+            return list(o)
+    elif isinstance(o, (RobotsFile, PathTrie, PathView)):
+        return o.as_dict()
+    elif isinstance(o, array):
+        return o.tolist()
+    elif isinstance(o, MappingProxyType):
+        return dict(o)
+    elif isinstance(o, re.Match):
+        return o[0]
+    elif isinstance(o, datetime):
+        return o.isoformat()
+    raise TypeError(f'Object of type {o.__class__.__name__} is not JSON serializable')
+
+
 class EnhancedJSONEncoder(json.JSONEncoder):
     def default(self, o):
-        if is_dataclass(o):
-            return asdict(o)
-        elif isinstance(o, set):
-            return list(o)
-        elif isinstance(o, RobotsFile):
-            return o.__dict__
-        elif isinstance(o, re.Match):
-            return o[0]
-        elif isinstance(o, datetime):
-            return o.isoformat()
-        return super().default(o)
+        try:
+            return json_default(o)
+        except TypeError:
+            return super().default(o)
+
+
+'''
+backend "json" is the reference output, "orjson" (if installed) is faster but compact
+(no spaces after separators, non-ascii chars not escaped) and only indents by 2
+'''
+def json_dumps(o, indent=None, backend="json"):
+    if backend == "orjson":
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(o, default=json_default, option=option).decode("utf-8")
+    return json.dumps(o, indent=indent, cls=EnhancedJSONEncoder)
     
 
 KNOWN_DIRECTIVES = \
@@ -58,7 +103,7 @@ KNOWN_DIRECTIVES = \
     ]
 
 
-@dataclass
+@dataclass(slots=True)
 class Directive:
     user_agent: str
     directive: KNOWN_DIRECTIVES
@@ -79,14 +124,57 @@ class Directive:
         compli = json_dct['compliance']
         return Directive(ua, dirName, rDir, v, rv, compli, ID)
 
-@dataclass
+class LineResult(NamedTuple):
+    # Immutable form of a parsed line, shared between every Directive made from the same line
+    directive: Optional[str]
+    raw_directive: Optional[str]
+    # ((group name, value), ...)
+    value: tuple
+    raw_value: str
+    compliance: bool
+
+    def value_dict(self):
+        return dict(self.value)
+
+    def to_directive(self, user_agent, id):
+        return Directive(user_agent, self.directive, self.raw_directive,
+                         self.value_dict(), self.raw_value, self.compliance, id)
+
+
+# Children of every leaf PathNode, read only so it can be shared
+EMPTY_CHILDREN = MappingProxyType({})
+
+
+def ids_array(ids=()):
+    # Directive ids of a path node, 32 bit unless one doesn't fit (ids from a corpus wide counter)
+    try:
+        return array('i', ids)
+    except OverflowError:
+        return array('q', ids)
+
+
+def _append_wide_id(node, id):
+    # node.ids.append for an id that overflowed the 32 bit array, the node's ids go 64 bit
+    node.ids = array('q', node.ids)
+    node.ids.append(id)
+
+
+@dataclass(slots=True)
 class PathNode:
     key: str = field(compare=True)
-    ids: list = field(default_factory=list)
-    children: dict = field(default_factory=dict)
+    ids: array = field(default_factory=lambda: array('i'))
+    children: dict = field(default_factory=lambda: EMPTY_CHILDREN)
 
     def add_id(self, id: int):
-        self.ids.append(id)
+        try:
+            self.ids.append(id)
+        except OverflowError:
+            _append_wide_id(self, id)
+
+    def add_child(self, node):
+        if self.children is EMPTY_CHILDREN:
+            self.children = dict()
+        self.children[node.key] = node
 
     @staticmethod
     def from_json(json_dct):
@@ -95,17 +183,227 @@ class PathNode:
             return None
         elif not json_dct['children']:
             #hit a terminal node
-            return PathNode(json_dct['key'], json_dct['ids'], dict())
+            return PathNode(json_dct['key'], ids_array(json_dct['ids']))
         else:
             paths = list()
             for kidKey, kidPathNode in json_dct['children'].items():
                 paths.append(PathNode.from_json(kidPathNode))
 
             children_current = {k.key: k for k in paths}
-            return PathNode(json_dct['key'], json_dct['ids'], children_current)
+            return PathNode(json_dct['key'], ids_array(json_dct['ids']), children_current)
+
+
+@dataclass(slots=True)
+class RadixNode:
+    # One path segment of a PathTrie, most nodes are this, RadixChain is the one with rest
+    key: str
+    ids: array = field(default_factory=lambda: array('i'))
+    # key of child -> child
+    children: dict = field(default_factory=lambda: EMPTY_CHILDREN)
+    # segments after key, none without a slot for them
+    rest: ClassVar[tuple] = ()
+
+    def segment(self, offset):
+        return self.rest[offset - 1] if offset else self.key
+
+
+@dataclass(slots=True)
+class RadixChain(RadixNode):
+    # A run of path segments that all have the same ids, collapsed into one node
+    rest: tuple = ()
+
+
+def _radix_node(key, rest, ids, children=EMPTY_CHILDREN):
+    # RadixChain only when there are segments after key
+    if rest:
+        return RadixChain(key, ids, children, rest)
+    return RadixNode(key, ids, children)
+
+
+class PathView:
+    '''
+    One segment of a PathTrie seen as a PathNode (key / ids / children, ids shared, children
+    built on access), for code walking revealedPathTree like the PathNode tree it was.
+    Serializes to the nested PathNode json cut at MAX_PATH_DEPTH levels.
+    '''
+    __slots__ = ("node", "offset", "depth")
+
+    def __init__(self, node, offset=0, depth=0):
+        self.node = node
+        self.offset = offset
+        self.depth = depth
+
+    @property
+    def key(self):
+        return self.node.segment(self.offset)
+
+    @property
+    def ids(self):
+        return self.node.ids
+
+    @property
+    def children(self):
+        node, offset, depth = self.node, self.offset, self.depth
+        if offset < len(node.rest):
+            return {node.rest[offset]: PathView(node, offset + 1, depth + 1)}
+        return {k: PathView(child, 0, depth + 1) for k, child in node.children.items()}
+
+    def as_dict(self):
+        node, offset, depth = self.node, self.offset, self.depth
+        if depth >= MAX_PATH_DEPTH - 1:
+            # nested json gets too deep for the encoder / PathNode.from_json past this
+            children = {}
+        elif offset < len(node.rest):
+            children = {node.rest[offset]: PathView(node, offset + 1, depth + 1)}
+        else:
+            children = {k: PathView(child, 0, depth + 1) for k, child in node.children.items()}
+        return {"key": node.segment(offset), "ids": node.ids, "children": children}
+
+
+class PathTrie:
+    '''
+    Compressed trie of revealed paths, split on "/" with empty segments dropped.
+    Every segment holds the ids of every path going through it, so a chain of
+    segments is only split when a path ends or branches inside it.
+    The root is the "" node, it holds -1 and the id of every path added.
+    key / ids / children are the root's as a PathView, so it walks like the PathNode
+    tree it replaced (to_path_node() builds that tree).
+    Serializes to the nested PathNode shape
+        {"key": "", "ids": [-1, ...], "children": {"segment": {"key": ..., "ids": [...], "children": {...}}}}
+    cut at MAX_PATH_DEPTH levels, the trie itself has no depth limit
+    '''
+    __slots__ = ("root",)
+
+    def __init__(self, root: Optional[RadixNode] = None):
+        self.root = root if root is not None else RadixNode("", array('i', [-1]))
+
+    def insert(self, segments: list, dirID: int):
+        node = self.root
+        try:
+            node.ids.append(dirID)
+        except OverflowError:
+            _append_wide_id(node, dirID)
+        i, n = 0, len(segments)
+        while i < n:
+            seg = segments[i]
+            child = node.children.get(seg)
+            if child is None:
+                if node.children is EMPTY_CHILDREN:
+                    node.children = dict()
+                if i + 1 == n:
+                    node.children[seg] = RadixNode(seg, ids_array((dirID,)))
+                else:
+                    node.children[seg] = RadixChain(seg, ids_array((dirID,)), EMPTY_CHILDREN, tuple(segments[i + 1:]))
+                return
+
+            rest = child.rest
+            j, m = 0, len(rest)
+            while j < m and i + 1 + j < n and rest[j] == segments[i + 1 + j]:
+                j += 1
+            if j < m:
+                # Path ends or branches inside the chain, the remainder keeps the chain's ids and
+                #   children, the part the path covers gets a copy it adds dirID to
+                tail = _radix_node(rest[j], rest[j + 1:], child.ids, child.children)
+                child = node.children[seg] = _radix_node(seg, rest[:j], tail.ids[:], {tail.key: tail})
+            try:
+                child.ids.append(dirID)
+            except OverflowError:
+                _append_wide_id(child, dirID)
+            node = child
+            i += 1 + j
+
+    def insert_many(self, items):
+        # (segments, dirID) pairs, in order
+        insert = self.insert
+        for segments, dirID in items:
+            insert(segments, dirID)
+
+    def __iter__(self):
+        # (segments, ids) of every non root segment, depth first in insertion order
+        stack = [((), child) for child in reversed(self.root.children.values())]
+        while stack:
+            prefix, node = stack.pop()
+            prefix += (node.key,)
+            yield prefix, node.ids
+            for seg in node.rest:
+                prefix += (seg,)
+                yield prefix, node.ids
+            stack.extend((prefix, child) for child in reversed(node.children.values()))
+
+    def node_count(self):
+        count, stack = 0, [self.root]
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(node.children.values())
+        return count
+
+    @property
+    def key(self):
+        return self.root.key
+
+    @property
+    def ids(self):
+        return self.root.ids
+
+    @property
+    def children(self):
+        return PathView(self.root).children
+
+    def as_dict(self):
+        return PathView(self.root).as_dict()
+
+    def to_path_node(self):
+        # The whole trie as a PathNode tree, one node per segment (ids shared), no depth cut
+        root = PathNode("", self.root.ids)
+        stack = [(root, self.root)]
+        while stack:
+            parent, node = stack.pop()
+            for child in node.children.values():
+                pathNode = PathNode(child.key, child.ids)
+                parent.add_child(pathNode)
+                for seg in child.rest:
+                    segNode = PathNode(seg, child.ids)
+                    pathNode.add_child(segNode)
+                    pathNode = segNode
+                stack.append((pathNode, child))
+        return root
+
+    @staticmethod
+    def from_path_nodes(root: Optional[PathNode], share_ids=False):
+        # Builds the trie back from a (possibly depth cut) PathNode tree, share_ids takes over
+        #   its ids arrays instead of copying them (a tree nothing else holds on to)
+        if root is None:
+            return None
+        ids = (lambda a: a) if share_ids else ids_array
+        trie = PathTrie(RadixNode("", ids(root.ids)))
+        stack = [(trie.root, root)]
+        while stack:
+            parent, pathNode = stack.pop()
+            for key, kid in pathNode.children.items():
+                rest = []
+                while len(kid.children) == 1:
+                    grandkid = next(iter(kid.children.values()))
+                    if grandkid.ids != kid.ids:
+                        break
+                    rest.append(grandkid.key)
+                    kid = grandkid
+                node = _radix_node(key, tuple(rest), ids(kid.ids))
+                if parent.children is EMPTY_CHILDREN:
+                    parent.children = dict()
+                parent.children[key] = node
+                stack.append((node, kid))
+        return trie
+
+    @staticmethod
+    def from_json(json_dct):
+        return PathTrie.from_path_nodes(PathNode.from_json(json_dct), share_ids=True)
 
 
 class RobotsFile:
+    # In the order they're serialized
+    __slots__ = ("user_agents", "directives", "comments", "wayback_url", "date", "domain", "filePath",
+                 "urlsFromComments", "pathsFromComments", "revealedPathTree")
     wayback_url: str
     date: datetime
     domain: str
@@ -115,12 +413,14 @@ class RobotsFile:
     comments: list[(int, str)]
     urlsFromComments: set[(int,str)]
     pathsFromComments: set[(int,str)]
-    # Dict:dict with nodes having ID's linking back to the parent directive
-    # {"/": {"ids": [], "children": {"path": {"ids": [], "children": {...}}}}}
-    revealedPathTree: Union[PathNode, None] = None
+    # Trie with nodes having ID's linking back to the parent directive, see PathTrie
+    revealedPathTree: Union[PathTrie, None]
+
+    # Per file metadata, everything else only depends on the file's lines
+    META_FIELDS = ("wayback_url", "date", "domain", "filePath")
 
-    def to_json(self, indent=None):
-        return json.dumps(self, indent=indent, cls=EnhancedJSONEncoder)
+    def to_json(self, indent=None, backend="json"):
+        return json_dumps(self, indent, backend)
 
     @staticmethod
     def from_json(json_dct):
@@ -149,7 +449,7 @@ class RobotsFile:
         for pair in json_dct['pathsFromComments']:
             pathsFromComments.add(tuple(pair))
 
-        revealedPathTree = PathNode.from_json(json_dct['revealedPathTree'])
+        revealedPathTree = PathTrie.from_json(json_dct['revealedPathTree'])
 
         return RobotsFile(wayback_url, date, domain,
                           filePath, user_agents, directives,
@@ -187,63 +487,60 @@ class RobotsFile:
         else:
             self.pathsFromComments = pathsFromComments
 
+        if isinstance(revealedPathTree, PathNode):
+            revealedPathTree = PathTrie.from_path_nodes(revealedPathTree)
         self.revealedPathTree = revealedPathTree
 
-    def _add_path_recurse(self, key: list, idx: int, robotNode: PathNode, dirID: Any):
-        if idx >= len(key):
-            return
-
-        if key[idx] not in robotNode.children:
-            robotNode.children[key[idx]] = PathNode(key[idx], [dirID])
-        else:
-            robotNode.children[key[idx]].add_id(dirID)
-
-        tmp = idx + 1
-        self._add_path_recurse(key, tmp, robotNode.children[key[idx]], dirID)
+    @staticmethod
+    def split_path(path_str):
+        # "/a//b/" -> ["a", "b"]
+        return [seg for seg in path_str.split("/") if seg]
 
     '''
-    INPUT: DirectiveID, PathString
-            Unique to dir, is parsable path
+    INPUT: DirectiveID, PathStrings
+            Unique to dir, only parsable paths are added
     '''
 
-    def add_path(self, directive_id, path_str):
-        # check if valid path
-        if path_str:
-            tmp = reMe.fullmatch(rfcRegexes.path_pattern, path_str)
-            if tmp:
-                # check if there is already a revealedTree
+    def add_paths(self, directive_id, path_strs):
+        items = []
+        for path_str in path_strs:
+            # check if valid path, no string passed means an empty field probably
+            if path_str and reMe.fullmatch(rfcRegexes.complied_path_pattern, path_str):
                 assert (path_str[0] == "/")
-                if not self.revealedPathTree:
-                    self.revealedPathTree = PathNode("", [-1])
-                # Add directive ID to root node
-                self.revealedPathTree.add_id(directive_id)
-                path_list = path_str.split("/")
-                path_list = path_list[:1] + [i for i in path_list[1:] if i != ""]
-                # Cut max depth to max depth, avoids python recursion errors
-                path_list = path_list[:MAX_PATH_DEPTH]
-                # add to revealedPathTree if it's more than just "/"
-                if len(path_list) > 1:
-                    try:
-                        self._add_path_recurse(path_list, 1, self.revealedPathTree, directive_id)
-                    except RecursionError:
-                        #This will never happen, since we apply the cutoff before calling
-                        pass
+                items.append((self.split_path(path_str), directive_id))
+        if items:
+            if self.revealedPathTree is None:
+                self.revealedPathTree = PathTrie()
+            self.revealedPathTree.insert_many(items)
 
-            else:
-                # Not a valid path string, skipping...
-                pass
-        else:
-            # no string passed, empty field probably
-            pass
+    def add_path(self, directive_id, path_str):
+        self.add_paths(directive_id, (path_str,))
 
     def extract_paths(self, s: str):
         return reMe.findall(rfcRegexes.complied_path_pattern, s)
 
     def extract_uris(self, s: str):
-        noschemes, cleaned_s = reMe.findall(rfcRegexes.compiled_no_scheme_uri, s), reMe.sub(rfcRegexes.compiled_no_scheme_uri, " ", s)
-        withschemes, cleaned_s = reMe.findall(rfcRegexes.compiled_absuri, cleaned_s), reMe.sub(rfcRegexes.compiled_absuri, " ", cleaned_s)
+        # Bare domains, then scheme uris in what's left, linear time (see uriScanner)
+        return uriScanner.extract_uris(s)
 
-        return noschemes + withschemes, cleaned_s
+    def value_paths(self, d: Directive, strip_comment=False):
+        # Paths revealed by the directive's value, a guessed directive's raw value still has its
+        #   trailing comment (the parser scans it whole) unless strip_comment
+        if d.compliance:
+            if "path" in d.value.keys():
+                return [d.value["path"]]
+            if d.directive == "acap-":
+                return self.extract_paths(d.value["val"])
+            return []
+        if d.directive and d.directive != "unknown":
+            if d.directive == "request-rate" and d.value['matched']:
+                return self.extract_paths(reMe.sub(rfcRegexes.KNOWN_LINES['request-rate'][2], "", d.value['matched']))
+            raw = d.raw_value
+            if strip_comment and d.value["eolComment"] not in ["\n", "", None]:
+                cut = raw.rfind("#" + d.value["eolComment"])
+                raw = raw[:cut] if cut >= 0 else raw
+            return self.extract_paths(raw)
+        return self.extract_paths(d.value["rawNoComment"])
 
     def add_comment(self, comment_string: str, directive_id: int):
 
@@ -254,7 +551,7 @@ class RobotsFile:
         paths = self.extract_paths(cleaned_comment_string)
         for path in paths:
             self.pathsFromComments.add((directive_id, path))
-            self.add_path(directive_id, path)
+        self.add_paths(directive_id, paths)
         self.comments.append((directive_id, comment_string))
 
     def add_directive(self, d: Union[Directive, None]):
@@ -271,13 +568,7 @@ class RobotsFile:
             if d.value["eolComment"] not in ["\n", ""] and d.directive != "comment":
                 self.add_comment(d.value["eolComment"], d.id)
 
-            if "path" in d.value.keys():
-                self.add_path(d.id, d.value["path"])
-
-            elif d.directive == "acap-":
-                matched_paths = self.extract_paths(d.value["val"])
-                for x in matched_paths:
-                    self.add_path(d.id, x)
+            self.add_paths(d.id, self.value_paths(d))
 
 
             if d.id not in self.directives:
@@ -299,14 +590,7 @@ class RobotsFile:
                 self.add_comment(d.value["eolComment"], d.id)
 
             # Check raw val strings for paths and uris
-            if d.directive == "request-rate" and d.value['matched']:
-                o = reMe.sub(rfcRegexes.KNOWN_LINES['request-rate'][2], "", d.value['matched'])
-            else:
-                o = d.raw_value
-
-            matched_paths = self.extract_paths(o)
-            for x in matched_paths:
-                self.add_path(d.id, x)
+            self.add_paths(d.id, self.value_paths(d))
 
 
             if d.id not in self.directives:
@@ -322,9 +606,7 @@ class RobotsFile:
             if d.value["eolComment"] not in ["\n", "", None] and d.directive != "comment":
                 self.add_comment(d.value["eolComment"], d.id)
 
-            matched_paths = self.extract_paths(d.value["rawNoComment"])
-            for x in matched_paths:
-                self.add_path(d.id, x)
+            self.add_paths(d.id, self.value_paths(d))
 
             d.directive = 'unknown'
 
@@ -335,7 +617,10 @@ class RobotsFile:
                                  f"This breaks the invariant that every directive has a unique ID")
 
 
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
     def __repr__(self):
-        return str(self.__dict__)
+        return str(self.as_dict())
     def __str__(self):
-        return str(self.__dict__)
+        return str(self.as_dict())
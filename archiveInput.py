@@ -0,0 +1,191 @@
+import gzip
+import os
+import tarfile
+import zipfile
+import zlib
+from datetime import datetime
+
+'''
+Streams robots files out of local archives as (member name, bytes), so a dump doesn't
+have to be unpacked into millions of tiny files first:
+    tar (any compression tarfile knows), zip, gzip (every member of a concatenation is
+    one file), WARC / WARC.gz (response / resource records)
+tar / zip / gzip members are passed through as is, with --wayback they start with the
+wayback header line like the flat files. WARC records get one made from their target URI
+and date when asked for (wayback=True).
+'''
+
+KINDS = ("tar", "zip", "gzip", "warc")
+WAYBACK_PREFIX = "https://web.archive.org/web"
+_READ_BLOCK = 1 << 16
+
+
+def detect(path):
+    # Archive kind of a file, None for anything else (a plain robots file)
+    if not os.path.isfile(path):
+        return None
+    lower = path.lower()
+    if lower.endswith((".warc", ".warc.gz")):
+        return "warc"
+    with open(path, "rb") as rIn:
+        magic = rIn.read(5)
+    if magic == b"WARC/":
+        return "warc"
+    if zipfile.is_zipfile(path):
+        return "zip"
+    if tarfile.is_tarfile(path):
+        return "tar"
+    if magic[:2] == b"\x1f\x8b":
+        with gzip.open(path, "rb") as gzIn:
+            if gzIn.read(5) == b"WARC/":
+                return "warc"
+        return "gzip"
+    return None
+
+
+def iter_members(path, kind=None, wayback=False):
+    kind = kind or detect(path)
+    if kind == "tar":
+        return iter_tar(path)
+    elif kind == "zip":
+        return iter_zip(path)
+    elif kind == "gzip":
+        return iter_gzip(path)
+    elif kind == "warc":
+        return iter_warc(path, wayback)
+    raise ValueError(f"{path} isn't a {'/'.join(KINDS)} archive")
+
+
+def iter_tar(path):
+    # Stream mode, members are read in order without seeking back
+    with tarfile.open(path, "r|*") as tarIn:
+        for member in tarIn:
+            if member.isfile():
+                yield member.name, tarIn.extractfile(member).read()
+
+
+def iter_zip(path):
+    with zipfile.ZipFile(path) as zipIn:
+        for info in zipIn.infolist():
+            if not info.is_dir():
+                yield info.filename, zipIn.read(info)
+
+
+def _gzip_name(header: bytes):
+    # FNAME of a gzip member header, None if it has none (or it's cut off)
+    if len(header) < 10 or not header[3] & 0x08:
+        return None
+    pos = 10
+    if header[3] & 0x04:
+        # FEXTRA
+        if len(header) < pos + 2:
+            return None
+        pos += 2 + int.from_bytes(header[pos:pos + 2], "little")
+    end = header.find(b"\x00", pos)
+    if end < 0:
+        return None
+    return header[pos:end].decode("latin-1")
+
+
+def iter_gzip(path):
+    '''
+    Every member of a (possibly concatenated) gzip file, named by its stored file name,
+    or <file name without .gz>#<member number> without one
+    '''
+    base = os.path.basename(path)
+    base = base[:-3] if base.lower().endswith(".gz") else base
+    n = 0
+    with open(path, "rb") as rIn:
+        pending = b""
+        while True:
+            if not pending.strip(b"\x00"):
+                # Some writers pad the end with zeros
+                pending = rIn.read(_READ_BLOCK)
+                if not pending.strip(b"\x00"):
+                    break
+            name = _gzip_name(pending[:_READ_BLOCK])
+            inflate = zlib.decompressobj(wbits=31)
+            parts = [inflate.decompress(pending)]
+            while not inflate.eof:
+                block = rIn.read(_READ_BLOCK)
+                if not block:
+                    raise EOFError(f"{path} ends in the middle of gzip member {n}")
+                parts.append(inflate.decompress(block))
+            pending = inflate.unused_data
+            yield name or f"{base}#{n}", b"".join(parts)
+            n += 1
+
+
+def _dechunk(body: bytes):
+    out = []
+    while body:
+        size_line, _, body = body.partition(b"\r\n")
+        size = int(size_line.split(b";")[0].strip() or b"0", 16)
+        if size == 0:
+            break
+        out.append(body[:size])
+        body = body[size + 2:]
+    return b"".join(out)
+
+
+def http_body(payload: bytes):
+    # Body of a raw HTTP response, transfer / content encodings undone
+    head, sep, body = payload.partition(b"\r\n\r\n")
+    if not sep:
+        head, sep, body = payload.partition(b"\n\n")
+    headers = dict()
+    for line in head.splitlines()[1:]:
+        k, _, v = line.partition(b":")
+        headers[k.strip().lower()] = v.strip().lower()
+    if headers.get(b"transfer-encoding") == b"chunked":
+        body = _dechunk(body)
+    if headers.get(b"content-encoding") in (b"gzip", b"x-gzip"):
+        try:
+            body = gzip.decompress(body)
+        except (OSError, EOFError, zlib.error):
+            pass
+    return body
+
+
+def wayback_header(uri, warc_date):
+    # The header line the wayback fetch puts in front of a robots file
+    timestamp = datetime.strptime(warc_date[:19], "%Y-%m-%dT%H:%M:%S").strftime("%Y%m%d%H%M%S")
+    return f"{WAYBACK_PREFIX}/{timestamp}/{uri}\n".encode("utf-8")
+
+
+def iter_warc(path, wayback=False):
+    '''
+    response (the HTTP body) and resource records of a WARC / WARC.gz file,
+    named by their WARC-Target-URI
+    '''
+    opener = gzip.open if path.lower().endswith(".gz") or detect_gzip(path) else open
+    with opener(path, "rb") as warcIn:
+        while True:
+            line = warcIn.readline()
+            if not line:
+                break
+            if not line.startswith(b"WARC/"):
+                # Blank lines between records
+                continue
+            headers = dict()
+            for line in iter(warcIn.readline, b""):
+                if not line.strip():
+                    break
+                k, _, v = line.decode("utf-8", "replace").partition(":")
+                headers[k.strip().lower()] = v.strip()
+            block = warcIn.read(int(headers.get("content-length", 0)))
+
+            record_type = headers.get("warc-type")
+            if record_type not in ("response", "resource"):
+                continue
+            uri = headers.get("warc-target-uri", "").strip("<>")
+            if record_type == "response" and "application/http" in headers.get("content-type", "application/http"):
+                block = http_body(block)
+            if wayback:
+                block = wayback_header(uri, headers.get("warc-date", "1970-01-01T00:00:00Z")) + block
+            yield uri, block
+
+
+def detect_gzip(path):
+    with open(path, "rb") as rIn:
+        return rIn.read(2) == b"\x1f\x8b"
@@ -0,0 +1,94 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import reMe
+import rfcRegexes
+import robotsParser
+
+
+def parse_cmd():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-f', "--file",
+                        required=True,
+                        help="robots file, or directory of robots files, to pull lines from",
+                        dest="robotsIn")
+    parser.add_argument("-r", "--repeat",
+                        required=False,
+                        type=int,
+                        default=3,
+                        help="number of passes over the lines, best pass is reported",
+                        dest="repeat")
+    return parser.parse_args()
+
+
+def full_scan_identify_line(lineIn):
+    # Old identify_line: try every KNOWN_LINES regex in order
+    for knownLine, stuffToUnpack in rfcRegexes.KNOWN_LINES.items():
+        reg, ngroups, expectedVal = stuffToUnpack
+        tmp = reMe.fullmatch(reg, lineIn)
+        if tmp:
+            return knownLine, True, (ngroups, tmp), None
+    matchedDir, val, rawDir = robotsParser.directive_guess(lineIn)
+    return matchedDir, False, val, rawDir
+
+
+def load_lines(robotsIn):
+    if os.path.isdir(robotsIn):
+        files = [os.path.join(robotsIn, f) for f in sorted(os.listdir(robotsIn)) if not f.endswith(".json")]
+    else:
+        files = [robotsIn]
+    lines = []
+    for file in files:
+        with open(file, "r", errors="replace") as rIn:
+            for line in rIn:
+                if line.strip():
+                    if line[-1] != "\n":
+                        line += "\n"
+                    lines.append(line)
+    return lines
+
+
+def comparable(result):
+    matchedDir, compliant, val, rawDir = result
+    if compliant:
+        val = (val[0], val[1].span(), val[1].groupdict())
+    return matchedDir, compliant, val, rawDir
+
+
+def lines_per_sec(fn, lines, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            fn(line)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(lines) / best
+
+
+def main():
+    args = parse_cmd()
+    lines = load_lines(args.robotsIn)
+    if not lines:
+        print("No lines to benchmark")
+        return 1
+
+    for line in lines:
+        if comparable(full_scan_identify_line(line)) != comparable(robotsParser.identify_line(line)):
+            print(f"Mismatch between full scan and dispatch for line: {line!r}")
+            return 1
+
+    before = lines_per_sec(full_scan_identify_line, lines, args.repeat)
+    after = lines_per_sec(robotsParser.identify_line, lines, args.repeat)
+    print(f"lines: {len(lines)}")
+    print(f"full scan: {before:,.0f} lines/sec")
+    print(f"dispatch:  {after:,.0f} lines/sec ({after / before:.2f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+'''
+Import time of robotsParser (and whatever else -m names) in fresh interpreters, best of
+--repeat runs out of python -X importtime, plus how long rfcRegexes.warm() takes (the
+regex compiling a pool worker does before its first file). Exits 1 when an import goes
+over --budget milliseconds. A first, uncounted run fills the bytecode cache, unless
+PYTHONDONTWRITEBYTECODE is set and every run compiles the sources again.
+'''
+
+DEFAULT_MODULES = ["robotsParser"]
+DEFAULT_BUDGET_MS = 200
+# "import time: self [us] | cumulative | imported package", indented two spaces per level
+IMPORTTIME_LINE = re.compile(r"import time:\s*(\d+) \|\s*(\d+) \| ( *)(\S+)$")
+
+
+def parse_cmd():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-m", "--module",
+                        required=False,
+                        action="append",
+                        default=None,
+                        help=f"module to import (repeatable), {', '.join(DEFAULT_MODULES)} by default",
+                        dest="modules")
+    parser.add_argument("-r", "--repeat",
+                        required=False,
+                        type=int,
+                        default=5,
+                        help="fresh interpreters per module, the fastest one is reported",
+                        dest="repeat")
+    parser.add_argument("--budget",
+                        required=False,
+                        type=float,
+                        default=DEFAULT_BUDGET_MS,
+                        help="milliseconds an import may take, 0 to only report",
+                        dest="budget")
+    parser.add_argument("--top",
+                        required=False,
+                        type=int,
+                        default=8,
+                        help="slowest imports (cumulative) listed per module",
+                        dest="top")
+    return parser.parse_args()
+
+
+def import_times(module):
+    # {imported package: cumulative seconds} of one fresh "import module", only the
+    #   module itself and what it imports directly
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                         check=True, capture_output=True, text=True).stderr
+    times = dict()
+    for line in out.splitlines():
+        m = IMPORTTIME_LINE.match(line)
+        if m and (len(m.group(3)) == 2 or m.group(4) == module):
+            times[m.group(4)] = int(m.group(2)) / 1e6
+    return times
+
+
+def measure(module, repeat=5):
+    '''
+    Output: (seconds, {directly imported package: cumulative seconds}) of the fastest of repeat imports
+    '''
+    import_times(module)
+    best = None
+    for _ in range(repeat):
+        times = import_times(module)
+        if best is None or times[module] < best[module]:
+            best = times
+    return best[module], best
+
+
+def measure_warm():
+    # Seconds rfcRegexes.warm() takes right after import, in a fresh interpreter
+    code = "import time, rfcRegexes; s = time.perf_counter(); rfcRegexes.warm(); print(time.perf_counter() - s)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return float(out)
+
+
+def main():
+    args = parse_cmd()
+    over = []
+    for module in args.modules or DEFAULT_MODULES:
+        seconds, times = measure(module, args.repeat)
+        flag = ""
+        if args.budget and seconds * 1000 > args.budget:
+            over.append(module)
+            flag = f"  OVER BUDGET ({args.budget:.0f}ms)"
+        print(f"import {module:20} {seconds * 1000:8.1f}ms{flag}")
+        slowest = sorted(((t, name) for name, t in times.items() if name != module), reverse=True)
+        for t, name in slowest[:args.top]:
+            print(f"    {name:28} {t * 1000:8.1f}ms")
+    print(f"rfcRegexes.warm()           {min(measure_warm() for _ in range(args.repeat)) * 1000:8.1f}ms")
+    if over:
+        print(f"Over the import budget: {', '.join(over)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
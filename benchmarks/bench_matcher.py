@@ -0,0 +1,73 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import robotsMatcher
+import robotsParser
+
+
+def parse_cmd():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rules",
+                        required=False,
+                        type=int,
+                        default=200,
+                        help="number of allow / disallow rules in the synthetic robots file",
+                        dest="rules")
+    parser.add_argument("--urls",
+                        required=False,
+                        type=int,
+                        default=200000,
+                        help="number of urls checked",
+                        dest="urls")
+    return parser.parse_args()
+
+
+def synthetic_robots(n, rng):
+    lines = ["User-agent: *"]
+    for i in range(n):
+        verb = rng.choice(["Allow", "Disallow", "Disallow"])
+        kind = rng.random()
+        if kind < 0.7:
+            lines.append(f"{verb}: /section-{i % 40}/page-{i}")
+        elif kind < 0.9:
+            lines.append(f"{verb}: /*/item-{i}*.html")
+        else:
+            lines.append(f"{verb}: /files/{i}/*.pdf$")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    args = parse_cmd()
+    rng = random.Random(0)
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as robotsOut:
+        robotsOut.write(synthetic_robots(args.rules, rng))
+    try:
+        robots = robotsParser.parse_robot_file(robotsOut.name)
+    finally:
+        os.unlink(robotsOut.name)
+
+    urls = [f"https://example.com/section-{rng.randrange(40)}/page-{rng.randrange(args.rules)}/item-{rng.randrange(args.rules)}.html"
+            for _ in range(args.urls)]
+
+    start = time.perf_counter()
+    matcher = robotsMatcher.RobotsMatcher.from_robots(robots)
+    matcher.rule_set("bench-bot")
+    compile_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    allowed = matcher.can_fetch_many("bench-bot", urls)
+    batch_s = time.perf_counter() - start
+
+    print(f"{args.rules} rules compiled in {compile_s * 1000:.1f} ms, "
+          f"{len(urls) / batch_s:,.0f} urls/s, {sum(allowed) / len(urls):.1%} allowed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import RobotsDataClasses
+import robotsParser
+
+
+def parse_cmd():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines",
+                        required=False,
+                        type=int,
+                        default=20000,
+                        help="number of lines in the synthetic garbage robots file",
+                        dest="lines")
+    parser.add_argument("--paths",
+                        required=False,
+                        type=int,
+                        default=20000,
+                        help="number of paths added to the synthetic path tree",
+                        dest="paths")
+    return parser.parse_args()
+
+
+def traced(build):
+    # Bytes still allocated by build() once it returns (its result kept alive)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def count_nodes(trie):
+    # (trie nodes, path segments the nodes stand for)
+    if trie is None:
+        return 0, 0
+    return trie.node_count(), 1 + sum(1 for _ in trie)
+
+
+def garbage_lines(n):
+    # HTML / path dump served as robots.txt, every line unique
+    for i in range(n):
+        if i % 3 == 0:
+            yield f"<div class=\"row-{i}\"><a href=\"/catalog/item-{i}/detail\">Item {i}</a></div>\n"
+        elif i % 3 == 1:
+            yield f"/static/assets/{i % 97}/img-{i}.png\n"
+        else:
+            yield f"Disallow: /archive/{i % 13}/{i}/\n"
+
+
+def build_robots(lines):
+    robots = RobotsDataClasses.RobotsFile("bench", None, "localhost", "bench")
+    for i, line in enumerate(lines):
+        robots.add_directive(robotsParser.classify_line(line).to_directive(None, i))
+    return robots
+
+
+def build_tree(n):
+    robots = RobotsDataClasses.RobotsFile("bench", None, "localhost", "bench")
+    for i in range(n):
+        robots.add_path(i, f"/site/section-{i % 50}/page-{i % 1000}/item-{i}")
+    return robots
+
+
+def main():
+    args = parse_cmd()
+    # Caches would keep the lines / results alive and skew the numbers
+    robotsParser.line_cache.maxsize = 0
+    lines = list(garbage_lines(args.lines))
+
+    robots, size = traced(lambda: build_robots(lines))
+    print(f"garbage file: {len(robots.directives)} directives, {count_nodes(robots.revealedPathTree)[0]} path nodes, "
+          f"{size / 1024 / 1024:.1f} MiB, {size / len(robots.directives):.0f} bytes/directive")
+
+    robots, size = traced(lambda: build_tree(args.paths))
+    nodes, segments = count_nodes(robots.revealedPathTree)
+    print(f"path tree: {args.paths} paths, {nodes} nodes for {segments} segments, {size / 1024 / 1024:.1f} MiB, "
+          f"{size / nodes:.0f} bytes/node, {size / segments:.0f} bytes/segment")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import argparse
+import os
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from RobotsDataClasses import PathNode, PathTrie, RobotsFile, MAX_PATH_DEPTH
+
+
+def parse_cmd():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--paths",
+                        required=False,
+                        type=int,
+                        default=20000,
+                        help="number of paths inserted per run",
+                        dest="paths")
+    parser.add_argument("--depth",
+                        required=False,
+                        type=int,
+                        default=40,
+                        help="segments in the deep paths",
+                        dest="depth")
+    return parser.parse_args()
+
+
+def recursive_insert(root, segments, dirID, idx=0):
+    # The per segment PathNode insert the trie replaced
+    if idx >= len(segments):
+        return
+    if segments[idx] not in root.children:
+        root.add_child(PathNode(segments[idx], array('i', [dirID])))
+    else:
+        root.children[segments[idx]].add_id(dirID)
+    recursive_insert(root.children[segments[idx]], segments, dirID, idx + 1)
+
+
+def run_old(items):
+    root = PathNode("", array('i', [-1]))
+    for segments, dirID in items:
+        root.add_id(dirID)
+        recursive_insert(root, segments[:MAX_PATH_DEPTH - 1], dirID)
+    return root
+
+
+def count_path_nodes(root):
+    count, stack = 0, [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.children.values())
+    return count
+
+
+def run_trie(items):
+    trie = PathTrie()
+    trie.insert_many(items)
+    return trie
+
+
+def timed(f, items):
+    start = time.perf_counter()
+    result = f(items)
+    return result, time.perf_counter() - start
+
+
+def main():
+    args = parse_cmd()
+    workloads = {
+        "shallow": [f"/site/section-{i % 50}/page-{i % 1000}/item-{i}" for i in range(args.paths)],
+        "deep": ["/" + "/".join(f"d{k}" for k in range(args.depth)) + f"/leaf-{i}" for i in range(args.paths)],
+    }
+    for name, paths in workloads.items():
+        items = [(RobotsFile.split_path(p), i) for i, p in enumerate(paths)]
+        root, old_s = timed(run_old, items)
+        trie, trie_s = timed(run_trie, items)
+        print(f"{name}: recursive {len(items) / old_s:,.0f} paths/s {count_path_nodes(root)} nodes, "
+              f"trie {len(items) / trie_s:,.0f} paths/s {trie.node_count()} nodes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
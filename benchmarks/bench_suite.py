@@ -0,0 +1,244 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import RobotsDataClasses
+import bench_import
+import reMe
+import robotsParser
+import synth_corpus
+
+'''
+Throughput of the hot paths on a synth_corpus corpus, written as json:
+    {"meta": {...}, "results": {name: {"rate": per second, "unit": ..., "ops": ..., "seconds": best pass}}}
+--baseline compares against an earlier results file and exits 1 when something got slower
+than --tolerance allows. Caches are off so every pass does the same work.
+"import" is robotsParser's import time in a fresh interpreter (bench_import.py, as imports/s).
+'''
+
+PARSER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "robotsParser.py")
+
+
+def parse_cmd():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--files",
+                        required=False,
+                        type=int,
+                        default=500,
+                        help="synthetic corpus size",
+                        dest="files")
+    parser.add_argument("--seed",
+                        required=False,
+                        type=int,
+                        default=0,
+                        help="synthetic corpus seed",
+                        dest="seed")
+    parser.add_argument("-r", "--repeat",
+                        required=False,
+                        type=int,
+                        default=3,
+                        help="passes per benchmark, the best one is reported",
+                        dest="repeat")
+    parser.add_argument("--only",
+                        required=False,
+                        action="append",
+                        default=None,
+                        help="only run this benchmark (repeatable)",
+                        dest="only")
+    parser.add_argument("--workers",
+                        required=False,
+                        type=int,
+                        default=1,
+                        help="--workers for the end to end run",
+                        dest="workers")
+    parser.add_argument("-o", "--output",
+                        required=False,
+                        default=None,
+                        help="write the results to this json file",
+                        dest="resultsOut")
+    parser.add_argument("--baseline",
+                        required=False,
+                        default=None,
+                        help="results file to compare against",
+                        dest="baseline")
+    parser.add_argument("--tolerance",
+                        required=False,
+                        type=float,
+                        default=0.10,
+                        help="slowdown (fraction of the baseline rate) still not counted as a regression",
+                        dest="tolerance")
+    return parser.parse_args()
+
+
+class Workload:
+    # Inputs of the microbenchmarks, pulled out of the synthetic corpus once
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self.files = sorted(os.path.join(corpus, f) for f in os.listdir(corpus))
+        self.bytes = sum(os.path.getsize(f) for f in self.files)
+        self.lines, self.tokens, self.comments, self.paths = [], [], [], []
+        for file in self.files:
+            with open(file, "r") as rIn:
+                rIn.readline()
+                for line in rIn:
+                    if not line.strip():
+                        continue
+                    self.lines.append(line if line.endswith("\n") else line + "\n")
+                    if line.startswith("#"):
+                        self.comments.append(line[1:].strip())
+                        continue
+                    head, sep, value = line.partition(":")
+                    if not sep:
+                        head, sep, value = line.strip().partition(" ")
+                    self.tokens.append(head)
+                    value = value.split("#", 1)[0].strip()
+                    if head.lower() in ("disallow", "allow") and value.startswith("/"):
+                        self.paths.append(value)
+        with reMe.watchdog():
+            self.robots = [robotsParser.parse_robot_file(f, wayback_arg=True) for f in self.files]
+
+
+def empty_robots():
+    return RobotsDataClasses.RobotsFile("bench", datetime(2020, 1, 1), "bench.example.com", "bench")
+
+
+def bench_identify_line(w):
+    for line in w.lines:
+        robotsParser.identify_line(line)
+    return len(w.lines), "lines/s"
+
+
+def bench_distance_guess(w):
+    for token in w.tokens:
+        robotsParser._distance_guess(token)
+    return len(w.tokens), "tokens/s"
+
+
+def bench_add_comment(w):
+    robots = empty_robots()
+    for dirID, comment in enumerate(w.comments):
+        robots.add_comment(comment, dirID)
+    return len(w.comments), "comments/s"
+
+
+def bench_extract_uris(w):
+    robots = empty_robots()
+    for comment in w.comments:
+        robots.extract_uris(comment)
+    return len(w.comments), "comments/s"
+
+
+def bench_add_path(w):
+    robots = empty_robots()
+    for dirID, path in enumerate(w.paths):
+        robots.add_path(dirID, path)
+    return len(w.paths), "paths/s"
+
+
+def bench_to_json(w):
+    for robots in w.robots:
+        robots.to_json()
+    return len(w.robots), "files/s"
+
+
+MICRO = {"identify_line": bench_identify_line, "distance_guess": bench_distance_guess,
+         "add_comment": bench_add_comment, "extract_uris": bench_extract_uris,
+         "add_path": bench_add_path, "to_json": bench_to_json}
+
+
+def run_micro(fn, w, repeat):
+    best = None
+    with reMe.watchdog():
+        for _ in range(repeat):
+            start = time.perf_counter()
+            ops, unit = fn(w)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    return {"rate": ops / best, "unit": unit, "ops": ops, "seconds": best}
+
+
+def run_end_to_end(w, repeat, workers):
+    # Whole robotsParser.py runs over the corpus, in a subprocess like a real run
+    best = None
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as out:
+            cmd = [sys.executable, PARSER, "-f", w.corpus, "-w", "-o", os.path.join(out, "out.jsonl"),
+                   "--errors", os.path.join(out, "errors.txt"), "--workers", str(workers),
+                   "--guess-cache-size", "0", "--line-cache-size", "0"]
+            for option, name in (("--robots-class", "r"), ("--empty-class", "e"), ("--non-empty-non-robots-class", "n"),
+                                 ("--non-empty-non-robots-threshold-class", "t"), ("--unknown", "u"),
+                                 ("--encoding-class", "c")):
+                cmd += [option, os.path.join(out, f"{name}.txt")]
+            start = time.perf_counter()
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {"end_to_end_files": {"rate": len(w.files) / best, "unit": "files/s", "ops": len(w.files), "seconds": best},
+            "end_to_end_bytes": {"rate": w.bytes / best / 1e6, "unit": "MB/s", "ops": w.bytes, "seconds": best}}
+
+
+def compare(results, baseline, tolerance):
+    # Names that got slower than tolerance allows, printing every ratio on the way
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["rate"] / baseline[name]["rate"]
+        flag = ""
+        if ratio < 1 - tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:20} {baseline[name]['rate']:>14,.1f} -> {result['rate']:>14,.1f} {result['unit']:11} "
+              f"{ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    args = parse_cmd()
+    # Every pass does the full work, no cache carried over from the one before
+    robotsParser.init_worker(robotsParser.WorkerOptions(guessCacheSize=0, lineCacheSize=0))
+
+    with tempfile.TemporaryDirectory() as corpus:
+        kinds = synth_corpus.generate(corpus, args.files, args.seed)
+        w = Workload(corpus)
+        results = dict()
+        for name, fn in MICRO.items():
+            if not args.only or name in args.only:
+                results[name] = run_micro(fn, w, args.repeat)
+        if not args.only or "end_to_end" in args.only:
+            results.update(run_end_to_end(w, args.repeat, args.workers))
+    if not args.only or "import" in args.only:
+        seconds, _ = bench_import.measure("robotsParser", args.repeat)
+        results["import"] = {"rate": 1 / seconds, "unit": "imports/s", "ops": 1, "seconds": seconds}
+
+    report = {"meta": {"date": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                       "platform": platform.platform(), "files": args.files, "seed": args.seed, "kinds": kinds,
+                       "repeat": args.repeat, "workers": args.workers},
+              "results": results}
+    if args.resultsOut:
+        with open(args.resultsOut, "w") as resultsOut:
+            json.dump(report, resultsOut, indent=1)
+
+    if args.baseline:
+        with open(args.baseline, "r") as baselineIn:
+            regressions = compare(results, json.load(baselineIn)["results"], args.tolerance)
+        if regressions:
+            print(f"Slower than the baseline: {', '.join(regressions)}")
+            return 1
+    else:
+        for name, result in results.items():
+            print(f"{name:20} {result['rate']:>14,.1f} {result['unit']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import uriScanner
+from check_uri_scanner import load_strings, random_strings, regex_extract_uris
+
+
+def parse_cmd():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-f', "--file",
+                        required=False,
+                        default=None,
+                        help="robots file, or directory of robots files, whose comments / lines are checked",
+                        dest="robotsIn")
+    parser.add_argument("--random",
+                        required=False,
+                        type=int,
+                        default=100000,
+                        help="number of random strings checked on top of the corpus",
+                        dest="random")
+    parser.add_argument("--seed",
+                        required=False,
+                        type=int,
+                        default=0,
+                        dest="seed")
+    return parser.parse_args()
+
+
+# Long runs that make findall rescan the same chars from every position
+PATHOLOGICAL = {"label run": "a" * 5000, "dash run": "a-" * 2500 + "x", "scheme run": "a+" * 2500,
+                "blank run": " " * 5000 + "x", "userinfo": "h://" + "a:" * 2500, "domains": "see a.b. " * 600}
+
+
+def timed(fn, strings):
+    start = time.perf_counter()
+    results = [fn(s) for s in strings]
+    return results, time.perf_counter() - start
+
+
+def main():
+    args = parse_cmd()
+    strings = random_strings(args.random, args.seed)
+    if args.robotsIn:
+        strings = load_strings(args.robotsIn) + strings
+
+    old, old_time = timed(regex_extract_uris, strings)
+    new, new_time = timed(uriScanner.extract_uris, strings)
+    mismatches = [s for s, a, b in zip(strings, old, new) if a != b]
+    for s in mismatches[:10]:
+        print(f"Mismatch for {s!r}: regex {regex_extract_uris(s)} scanner {uriScanner.extract_uris(s)}")
+    print(f"strings: {len(strings)}, mismatches: {len(mismatches)}")
+    print(f"regexes: {old_time:.3f}s, scanner: {new_time:.3f}s ({old_time / new_time:.2f}x)")
+
+    for name, s in PATHOLOGICAL.items():
+        (a,), old_time = timed(regex_extract_uris, [s])
+        (b,), new_time = timed(uriScanner.extract_uris, [s])
+        print(f"{name:12} regexes {old_time * 1000:9.2f}ms scanner {new_time * 1000:7.2f}ms{'' if a == b else '  MISMATCH'}")
+        if a != b:
+            mismatches.append(s)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
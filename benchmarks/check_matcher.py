@@ -0,0 +1,93 @@
+import argparse
+import os
+import random
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import robotsMatcher
+
+'''
+RuleSet.allowed against a plain reference matcher (every rule tried, the longest match
+wins, allow on a tie) on random rule sets / paths, plus the cases that went wrong before.
+Exits 1 on any mismatch.
+'''
+
+# (rules, path, allowed)
+CASES = [
+    # A longer prefix rule the path is too short for doesn't score a shorter one
+    ([(False, "/shop"), (False, "/private/area"), (True, "/shop$")], "/shop", True),
+    ([(False, "/shop"), (True, "/shop$")], "/shop", True),
+    ([(False, "/a"), (True, "/a/b/c/d"), (True, "/a*")], "/a", True),
+    ([(True, "/p"), (False, "/p$")], "/p", False),
+    ([(False, "/"), (True, "/x")], "/robots.txt", True),
+]
+
+ALPHABET = "/ab.$*"
+
+
+def parse_cmd():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--rounds",
+                        required=False,
+                        type=int,
+                        default=20000,
+                        help="random rule sets checked",
+                        dest="rounds")
+    parser.add_argument("--seed",
+                        required=False,
+                        type=int,
+                        default=0,
+                        dest="seed")
+    return parser.parse_args()
+
+
+def reference_allowed(rules, path):
+    # Straight from the rules, no prefix table / combined regex
+    if path == "/robots.txt":
+        return True
+    best_len, best_allow = -1, True
+    for allow, pattern in rules:
+        pattern = robotsMatcher.normalize(pattern.strip())
+        if not pattern:
+            continue
+        if re.match(robotsMatcher._wildcard_regex(pattern), path, re.DOTALL) is None:
+            continue
+        if len(pattern) > best_len or (len(pattern) == best_len and allow):
+            best_len, best_allow = len(pattern), allow
+    return best_allow
+
+
+def random_pattern(rng):
+    pattern = "/" + "".join(rng.choice(ALPHABET[1:5]) for _ in range(rng.randint(0, 5)))
+    if rng.random() < 0.2:
+        i = rng.randint(1, len(pattern))
+        pattern = pattern[:i] + "*" + pattern[i:]
+    if rng.random() < 0.2:
+        pattern += "$"
+    return pattern
+
+
+def main():
+    args = parse_cmd()
+    rng = random.Random(args.seed)
+    cases = list(CASES)
+    for _ in range(args.rounds):
+        rules = [(rng.random() < 0.4, random_pattern(rng)) for _ in range(rng.randint(1, 6))]
+        path = "/" + "".join(rng.choice("/ab.") for _ in range(rng.randint(0, 6)))
+        cases.append((rules, path, reference_allowed(rules, path)))
+
+    mismatches = 0
+    for rules, path, expected in cases:
+        got = robotsMatcher.RuleSet(rules).allowed(path)
+        if got != expected:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f"Mismatch for {path!r} under {rules}: matcher {got}, expected {expected}")
+    print(f"cases: {len(cases)}, mismatches: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
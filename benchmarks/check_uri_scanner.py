@@ -0,0 +1,113 @@
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import rfcRegexes
+import synth_corpus
+import uriScanner
+
+'''
+Differential check of uriScanner.extract_uris against the findall / sub passes of
+rfcRegexes.compiled_no_scheme_uri / compiled_absuri it replaced, on every line and comment
+of a corpus sample (-f, a synthetic one by default), the EDGE strings and random strings.
+Exits 1 on any mismatch. bench_uri_scanner.py times the two.
+'''
+
+# Corner cases of the two regexes, the long runs are the ones that were quadratic
+EDGE = ["", " ", "\t", "a", "a.b", " a.b ", "a..b", ".a.b.", "a-.b", "-a.b-", "a.b.c.d", "a.b a.b",
+        "a.b\ta.b", "x:", "x:y", "1x:y", "+x:y", "x+-.:y", "h://", "h://a@b:1/p?q#f", "h://[::1]/",
+        "h://[v1.x]/", "h://[1::2:3:4:5:6:7]/", "mailto:a@b.c", "a.b:c", "see http://a.b/c, d.e",
+        "http://a.b/c http://d.e/f", "é.b", "a.é", "ab:é", "x:%2F", "x:%2", "a:b:c:d", "http:http:",
+        "a" * 5000, "a-" * 2500 + "x", "a+" * 2500, " " * 5000 + "x", "h://" + "a:" * 2500,
+        "see a.b. " * 600]
+
+
+def parse_cmd():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-f', "--file",
+                        required=False,
+                        default=None,
+                        help="robots file, or directory of robots files, whose comments / lines are checked "
+                             "(a synthetic corpus sample by default)",
+                        dest="robotsIn")
+    parser.add_argument("-n", "--files",
+                        required=False,
+                        type=int,
+                        default=300,
+                        help="synthetic corpus sample size, without -f",
+                        dest="files")
+    parser.add_argument("--random",
+                        required=False,
+                        type=int,
+                        default=100000,
+                        help="number of random strings checked on top of the corpus",
+                        dest="random")
+    parser.add_argument("--seed",
+                        required=False,
+                        type=int,
+                        default=0,
+                        dest="seed")
+    return parser.parse_args()
+
+
+def regex_extract_uris(s):
+    # The findall / sub passes uriScanner replaced (without reMe's timeout)
+    noschemes, cleaned_s = re.findall(rfcRegexes.compiled_no_scheme_uri, s), re.sub(rfcRegexes.compiled_no_scheme_uri, " ", s)
+    withschemes, cleaned_s = re.findall(rfcRegexes.compiled_absuri, cleaned_s), re.sub(rfcRegexes.compiled_absuri, " ", cleaned_s)
+    return noschemes + withschemes, cleaned_s
+
+
+def load_strings(robotsIn):
+    # Every comment (from its "#") and every whole line, long HTML lines included
+    if os.path.isdir(robotsIn):
+        files = [os.path.join(robotsIn, f) for f in sorted(os.listdir(robotsIn)) if not f.endswith(".json")]
+    else:
+        files = [robotsIn]
+    strings = []
+    for file in files:
+        with open(file, "r", errors="replace") as rIn:
+            for line in rIn:
+                line = line.rstrip("\n")
+                strings.append(line)
+                if "#" in line:
+                    strings.append(line[line.index("#"):])
+    return strings
+
+
+def random_strings(n, seed):
+    # Short strings out of the chars the two regexes care about, corner cases turn up quickly
+    rng = random.Random(seed)
+    alphabet = "ab.:/-@%2F[]v1?#  \t+'\\x9AZé_~=&;,()*!$"
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 25))) for _ in range(n)]
+
+
+def mismatches(strings):
+    # Strings the two disagree on
+    return [s for s in strings if regex_extract_uris(s) != uriScanner.extract_uris(s)]
+
+
+def main():
+    args = parse_cmd()
+    if args.robotsIn:
+        strings = load_strings(args.robotsIn)
+    else:
+        with tempfile.TemporaryDirectory() as corpus:
+            synth_corpus.generate(corpus, args.files, args.seed)
+            strings = load_strings(corpus)
+    strings += EDGE + random_strings(args.random, args.seed)
+
+    wrong = mismatches(strings)
+    for s in wrong[:10]:
+        print(f"Mismatch for {s[:200]!r}: regex {regex_extract_uris(s)} scanner {uriScanner.extract_uris(s)}")
+    print(f"strings: {len(strings)}, mismatches: {len(wrong)}")
+    return 1 if wrong else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+import argparse
+import os
+import random
+import sys
+
+'''
+Deterministic synthetic robots.txt corpus, file i only depends on (seed, i) so a bigger
+corpus starts with the files of a smaller one. Kinds, picked by weight:
+    compliant  templated groups of user agents / allow / disallow / crawl-delay / sitemap
+    typo       the same with misspelled directives, missing colons, odd casing
+    html       an HTML page served as robots.txt, long lines
+    deep       paths with many segments
+    comments   comment heavy, urls / bare domains / paths in the comments
+Every file starts with a wayback header line (parse with -w).
+'''
+
+KINDS = {"compliant": 50, "typo": 20, "html": 5, "deep": 10, "comments": 15}
+AGENTS = ["*", "Googlebot", "Bingbot", "GPTBot", "CCBot", "Baiduspider", "YandexBot", "AhrefsBot",
+          "Mediapartners-Google", "facebookexternalhit"]
+SECTIONS = ["wp-admin", "cgi-bin", "private", "search", "cart", "checkout", "tmp", "api", "static",
+            "user", "login", "feeds", "tag", "category", "print"]
+TYPOS = {"User-agent": ["User-Agent", "useragent", "User agent", "Usr-agent", "User-agnet"],
+         "Disallow": ["Dissallow", "Disalow", "disallow", "DisAllow", "Disallow:"],
+         "Allow": ["Alow", "allow", "Allow ="],
+         "Crawl-delay": ["Crawl-Delay", "Crawldelay", "Crawl delay"],
+         "Sitemap": ["Site-map", "SiteMap", "sitemap"]}
+
+
+def wayback_line(rng, domain):
+    timestamp = f"{rng.randint(2010, 2024)}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}120000"
+    return f"https://web.archive.org/web/{timestamp}/http://{domain}/robots.txt"
+
+
+def random_path(rng, depth=None):
+    depth = depth if depth is not None else rng.randint(1, 4)
+    segments = [rng.choice(SECTIONS) if i == 0 else f"{rng.choice(SECTIONS)}-{rng.randint(0, 999)}"
+                for i in range(depth)]
+    path = "/" + "/".join(segments)
+    kind = rng.random()
+    if kind < 0.15:
+        path += "/*.php$"
+    elif kind < 0.3:
+        path += "/"
+    elif kind < 0.4:
+        path += "?sort=*"
+    return path
+
+
+def compliant_lines(rng, typo=0.0, depth=None):
+    lines = []
+    for group in range(rng.randint(1, 5)):
+        for agent in rng.sample(AGENTS, rng.randint(1, 3)):
+            lines.append(("User-agent", agent))
+        for _ in range(rng.randint(1, 15)):
+            lines.append((rng.choice(["Disallow", "Disallow", "Allow"]), random_path(rng, depth)))
+        if rng.random() < 0.3:
+            lines.append(("Crawl-delay", str(rng.randint(1, 30))))
+        lines.append(("", ""))
+    lines.append(("Sitemap", f"https://www.example{rng.randint(0, 99)}.com/sitemap.xml"))
+
+    out = []
+    for directive, value in lines:
+        if not directive:
+            out.append("")
+        elif rng.random() < typo:
+            spelling = rng.choice(TYPOS[directive])
+            out.append(f"{spelling} {value}" if rng.random() < 0.3 else f"{spelling}: {value}")
+        else:
+            out.append(f"{directive}: {value}")
+    return out
+
+
+def html_lines(rng):
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "robots", "page", "not", "found", "error"]
+    body = " ".join(rng.choice(words) for _ in range(rng.randint(200, 2000)))
+    return ["<!DOCTYPE html>", "<html><head><title>404 Not Found</title>",
+            '<link rel="stylesheet" href="/static/css/site.css"></head>',
+            f"<body><div class=\"content\"><p>{body}</p>",
+            '<a href="/index.html">home</a> <a href="https://www.example.com/help">help</a></div></body></html>']
+
+
+def comment_lines(rng):
+    lines = []
+    for _ in range(rng.randint(5, 40)):
+        kind = rng.random()
+        if kind < 0.3:
+            lines.append(f"# see https://www.example{rng.randint(0, 99)}.com/{rng.choice(SECTIONS)}/info.html for details")
+        elif kind < 0.5:
+            lines.append(f"# contact webmaster@example{rng.randint(0, 99)}.org or visit example{rng.randint(0, 99)}.net")
+        elif kind < 0.7:
+            lines.append(f"# {random_path(rng)} was moved to {random_path(rng)}")
+        else:
+            lines.append("# " + " ".join(rng.choice(SECTIONS) for _ in range(rng.randint(3, 30))))
+        if rng.random() < 0.3:
+            lines.append(f"Disallow: {random_path(rng)}  # {rng.choice(SECTIONS)} http://example.com{random_path(rng)}")
+    return ["User-agent: *"] + lines
+
+
+def robots_file(seed, i, kinds=KINDS):
+    # (kind, content) of file i
+    rng = random.Random(f"{seed}:{i}")
+    kind = rng.choices(list(kinds), weights=list(kinds.values()))[0]
+    if kind == "compliant":
+        lines = compliant_lines(rng)
+    elif kind == "typo":
+        lines = compliant_lines(rng, typo=0.6)
+    elif kind == "html":
+        lines = html_lines(rng)
+    elif kind == "deep":
+        lines = compliant_lines(rng, depth=rng.randint(20, 120))
+    else:
+        lines = comment_lines(rng)
+    return kind, "\n".join([wayback_line(rng, f"site{i}.example.com")] + lines) + "\n"
+
+
+def generate(directory, files, seed=0, kinds=KINDS):
+    '''
+    Writes robots-<i>.txt files into directory, returns {kind: files}
+    '''
+    os.makedirs(directory, exist_ok=True)
+    counts = dict.fromkeys(kinds, 0)
+    for i in range(files):
+        kind, content = robots_file(seed, i, kinds)
+        counts[kind] += 1
+        with open(os.path.join(directory, f"robots-{i:06d}.txt"), "w") as robotsOut:
+            robotsOut.write(content)
+    return counts
+
+
+def parse_cmd():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-o", "--output",
+                        required=True,
+                        help="directory to write the corpus to",
+                        dest="directory")
+    parser.add_argument("-n", "--files",
+                        required=False,
+                        type=int,
+                        default=1000,
+                        help="number of files",
+                        dest="files")
+    parser.add_argument("--seed",
+                        required=False,
+                        type=int,
+                        default=0,
+                        help="same seed, same corpus",
+                        dest="seed")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_cmd()
+    print(generate(args.directory, args.files, args.seed))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+import importlib.util
+import json
+import os
+import zlib
+from array import array
+
+import rfcRegexes
+
+# Imported by _load_pyarrow() once a parquet / arrow export is opened, it's most of the
+#   import time of this module otherwise
+pyarrow = None
+
+FORMATS = ("parquet", "arrow", "rcol")
+DEFAULT_BATCH_ROWS = 65536
+RCOL_MAGIC = b"RCOL1\n"
+
+# Every key a Directive.value dict can have, flattened into value_<key> columns
+VALUE_FIELDS = []
+for _ngroups in rfcRegexes.KNOWN_GROUPS.values():
+    VALUE_FIELDS += [g for g in _ngroups if g not in VALUE_FIELDS]
+# Non compliant directives (guessed / unknown)
+VALUE_FIELDS += ["matched", "rawNoComment"]
+
+TABLES = {
+    "directives": [("file", "str"), ("id", "int"), ("user_agent", "str"), ("directive", "str"),
+                   ("raw_directive", "str"), ("raw_value", "str"), ("compliance", "bool")]
+                  + [(f"value_{k}", "str") for k in VALUE_FIELDS],
+    "comments": [("file", "str"), ("id", "int"), ("comment", "str")],
+    "urlsFromComments": [("file", "str"), ("id", "int"), ("url", "str")],
+    "pathsFromComments": [("file", "str"), ("id", "int"), ("path", "str")],
+    "classification": [("file", "str"), ("wayback_url", "str"), ("domain", "str"), ("date", "str"),
+                       ("classification", "str")],
+}
+
+
+def _load_pyarrow():
+    # pyarrow, None if it isn't installed
+    global pyarrow
+    if pyarrow is None:
+        try:
+            import pyarrow
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError:
+            pyarrow = None
+    return pyarrow
+
+
+def default_format():
+    return "parquet" if pyarrow is not None or importlib.util.find_spec("pyarrow") is not None else "rcol"
+
+
+def _str(v):
+    return None if v is None else str(v)
+
+
+'''
+Input: parsed RobotsFile and its guess_if_robots classification
+Output: {table: [row tuple, ...]} in TABLES column order
+'''
+def file_rows(robots, robotsClass):
+    f = robots.filePath
+    directives = []
+    for dirID, d in robots.directives.items():
+        value = d.value if isinstance(d.value, dict) else dict()
+        directives.append((f, dirID, _str(d.user_agent), d.directive, d.raw_directive, d.raw_value,
+                           bool(d.compliance)) + tuple(_str(value.get(k)) for k in VALUE_FIELDS))
+
+    return {
+        "directives": directives,
+        "comments": [(f, dirID, c) for dirID, c in robots.comments],
+        "urlsFromComments": [(f, dirID, u) for dirID, u in sorted(robots.urlsFromComments)],
+        "pathsFromComments": [(f, dirID, p) for dirID, p in sorted(robots.pathsFromComments)],
+        "classification": [(f, robots.wayback_url, robots.domain,
+                            robots.date.isoformat() if robots.date else None, robotsClass)],
+    }
+
+
+class _RcolWriter:
+    '''
+    Stdlib fallback, a table file is RCOL_MAGIC followed by batches of
+        json header line {"rows": n, "columns": [[name, type, [buffer sizes]], ...]}
+        zlib compressed column buffers
+    int columns: array('q') values, bool columns: array('b') values,
+    str columns: array('b') null flags, array('q') offsets (rows + 1), utf-8 data
+    '''
+
+    def __init__(self, path, columns):
+        self.columns = columns
+        self._out = open(path, "wb")
+        self._out.write(RCOL_MAGIC)
+
+    def write_batch(self, data):
+        header = []
+        buffers = []
+        for (name, kind), values in zip(self.columns, data):
+            if kind == "int":
+                bufs = [array("q", values).tobytes()]
+            elif kind == "bool":
+                bufs = [array("b", values).tobytes()]
+            else:
+                nulls = array("b", [v is None for v in values])
+                offsets = array("q", [0])
+                blob = bytearray()
+                for v in values:
+                    if v is not None:
+                        blob += v.encode("utf-8", "surrogatepass")
+                    offsets.append(len(blob))
+                bufs = [nulls.tobytes(), offsets.tobytes(), bytes(blob)]
+            bufs = [zlib.compress(b, 1) for b in bufs]
+            header.append([name, kind, [len(b) for b in bufs]])
+            buffers += bufs
+        self._out.write(json.dumps({"rows": len(data[0]), "columns": header}).encode("utf-8") + b"\n")
+        for b in buffers:
+            self._out.write(b)
+
+    def close(self):
+        self._out.close()
+
+
+def read_rcol(path, columns=None):
+    '''
+    Yields every batch of an rcol table as {column: values}, only decoding the
+    requested columns (ints / bools stay arrays)
+    '''
+    with open(path, "rb") as rIn:
+        if rIn.read(len(RCOL_MAGIC)) != RCOL_MAGIC:
+            raise ValueError(f"{path} is not an rcol table")
+        while True:
+            header = rIn.readline()
+            if not header:
+                break
+            header = json.loads(header)
+            batch = dict()
+            for name, kind, sizes in header["columns"]:
+                if columns is not None and name not in columns:
+                    rIn.seek(sum(sizes), os.SEEK_CUR)
+                    continue
+                bufs = [zlib.decompress(rIn.read(size)) for size in sizes]
+                if kind == "int":
+                    batch[name] = array("q", bufs[0])
+                elif kind == "bool":
+                    batch[name] = array("b", bufs[0])
+                else:
+                    nulls, offsets, blob = array("b", bufs[0]), array("q", bufs[1]), bufs[2]
+                    batch[name] = [None if nulls[i] else blob[offsets[i]:offsets[i + 1]].decode("utf-8", "surrogatepass")
+                                   for i in range(header["rows"])]
+            yield batch
+
+
+class _ArrowWriter:
+    TYPES = {"int": "int64", "bool": "bool_", "str": "string"}
+
+    def __init__(self, path, columns, fmt):
+        self.schema = pyarrow.schema([(name, getattr(pyarrow, self.TYPES[kind])()) for name, kind in columns])
+        if fmt == "parquet":
+            self._writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression="zstd")
+        else:
+            self._writer = pyarrow.ipc.new_file(path, self.schema)
+
+    def write_batch(self, data):
+        self._writer.write_batch(pyarrow.record_batch(
+            [pyarrow.array(values, type=field.type) for values, field in zip(data, self.schema)],
+            schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+
+
+class ColumnarExporter:
+    '''
+    Writes one file per table in TABLES to directory (<table>.parquet / .arrow / .rcol),
+    rows are held column wise and written out every batch_rows rows per table
+    '''
+
+    def __init__(self, directory, fmt=None, batch_rows=DEFAULT_BATCH_ROWS):
+        fmt = fmt or default_format()
+        if fmt != "rcol" and _load_pyarrow() is None:
+            raise ValueError(f"{fmt} export needs pyarrow installed, use rcol")
+        os.makedirs(directory, exist_ok=True)
+        self.batch_rows = batch_rows
+        self._writers = dict()
+        self._columns = dict()
+        for table, columns in TABLES.items():
+            path = os.path.join(directory, f"{table}.{fmt}")
+            if fmt == "rcol":
+                self._writers[table] = _RcolWriter(path, columns)
+            else:
+                self._writers[table] = _ArrowWriter(path, columns, fmt)
+            self._columns[table] = [[] for _ in columns]
+
+    def add_rows(self, rows: dict):
+        for table, tableRows in rows.items():
+            columns = self._columns[table]
+            for row in tableRows:
+                for column, v in zip(columns, row):
+                    column.append(v)
+            if len(columns[0]) >= self.batch_rows:
+                self._flush(table)
+
+    def add(self, robots, robotsClass):
+        self.add_rows(file_rows(robots, robotsClass))
+
+    def _flush(self, table):
+        columns = self._columns[table]
+        if columns[0]:
+            self._writers[table].write_batch(columns)
+            self._columns[table] = [[] for _ in columns]
+
+    def close(self):
+        for table in self._writers:
+            self._flush(table)
+            self._writers[table].close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
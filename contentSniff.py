@@ -0,0 +1,87 @@
+import codecs
+import io
+import re
+
+import rfcRegexes
+
+DEFAULT_SAMPLE_BYTES = 8192
+
+# verdict -> guess_if_robots bucket the file goes to without being parsed
+BUCKETS = {
+    "empty": "EMPTY",
+    "binary": "NON-EMPTY, NON-ROBOTS",
+    "html": "NON-EMPTY, NON-ROBOTS",
+    "json": "NON-EMPTY, NON-ROBOTS",
+    "long-lines": "NON-EMPTY, NON-ROBOTS",
+    "encoding": "ENCODING",
+}
+
+# Share of control bytes (besides \t \n \r \f) that makes a sample binary
+BINARY_RATIO = 0.3
+# Mean line length of a sample that makes it a minified / dumped blob, robots lines are short
+LONG_LINE_MEAN = 1000
+
+html_start = re.compile(rb"<(?:!doctype\s+html|html|head|body|\?xml|title|meta|script|!--)", re.IGNORECASE)
+json_start = re.compile(rb'(?:\{\s*"|\[\s*[\[{"\]])')
+# A line that looks like a directive, html / json / blobs with one of these get parsed anyway
+#   (e.g. an html error banner in front of a real robots file)
+directive_line = re.compile(rb"^[ \t]*(?:%s|acap-[^:\s]*|[^:\s]*-sitemap)[ \t]*:" %
+                            b"|".join(re.escape(name.encode()) for name in rfcRegexes.DIRECTIVE_NAMES),
+                            re.IGNORECASE | re.MULTILINE)
+_control_bytes = bytes(b for b in range(32) if b not in b"\t\n\r\f") + b"\x7f"
+_utf8_decoder = codecs.getincrementaldecoder("utf-8")
+
+
+def valid_utf8(sample: bytes, complete=True):
+    # A multibyte sequence cut off at the end of an incomplete sample still counts
+    try:
+        _utf8_decoder().decode(sample, final=complete)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def looks_binary(sample: bytes):
+    return b"\x00" in sample or len(sample.translate(None, _control_bytes)) < len(sample) * (1 - BINARY_RATIO)
+
+
+'''
+Input: file path, wayback (first line is the wayback header), data (content of an archive member)
+Output: (verdict, header line) verdict is a BUCKETS key for obvious non robots content
+        or None if the file should be parsed, header is the decoded first line with wayback
+Only looks at the first sample_bytes after the header, anything it isn't sure about is parsed.
+Text that isn't UTF-8 (what the parser reads files as) is "encoding", it would only fail in the parser.
+'''
+def sniff(path, wayback=False, sample_bytes=DEFAULT_SAMPLE_BYTES, data=None):
+    with (open(path, "rb") if data is None else io.BytesIO(data)) as rIn:
+        header = None
+        raw_header = b""
+        if wayback:
+            raw_header = rIn.readline()
+            header = raw_header.decode("utf-8", errors="replace").strip()
+        sample = rIn.read(sample_bytes)
+        complete = not rIn.read(1)
+
+    if sample.startswith(b"\xef\xbb\xbf"):
+        sample = sample[3:]
+    start = sample.lstrip()
+
+    if not valid_utf8(raw_header) or not valid_utf8(sample, complete):
+        # A binary payload doesn't decode either (its first line included, with wayback),
+        #   only text that fails to decode is "encoding"
+        return ("binary" if looks_binary(raw_header + sample) else "encoding"), header
+    if not start:
+        return ("empty" if complete else None), header
+    if directive_line.search(sample):
+        return None, header
+    if looks_binary(sample):
+        return "binary", header
+    if html_start.match(start):
+        return "html", header
+    if json_start.match(start):
+        return "json", header
+
+    lines = sample.count(b"\n")
+    if not complete and (lines == 0 or len(sample) / lines > LONG_LINE_MEAN):
+        return "long-lines", header
+    return None, header
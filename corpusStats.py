@@ -0,0 +1,332 @@
+import argparse
+import base64
+import hashlib
+import json
+import math
+import os
+import sys
+import zlib
+from array import array
+from collections import Counter
+
+from urllib.parse import urlsplit
+
+import invertedIndex
+
+'''
+Corpus statistics kept while a run goes (robotsParser.py --stats), no second pass over the output:
+    exact counters for the small key spaces: classes, directive names, compliant directives
+    sketches for the unbounded ones: user agent tokens, revealed paths, disallowed paths,
+        urls in comments (HyperLogLog distinct counts, Count-Min frequencies, top-k)
+Everything merges (stats of separate runs / shards add up to the stats of all of them)
+and round trips through json, see CorpusStats.save / merge.
+'''
+
+DEFAULT_HLL_PRECISION = 14
+DEFAULT_CMS_WIDTH = 4096
+DEFAULT_CMS_DEPTH = 4
+DEFAULT_TOP_K = 100
+
+
+def _hash64(item: str):
+    return int.from_bytes(hashlib.blake2b(item.encode("utf-8", "surrogatepass"), digest_size=8).digest(), "little")
+
+
+def _pack(a: array):
+    return base64.b64encode(zlib.compress(a.tobytes(), 6)).decode("ascii")
+
+
+def _unpack(typecode, s):
+    return array(typecode, zlib.decompress(base64.b64decode(s)))
+
+
+class HyperLogLog:
+    # Distinct count estimate, ~1.04 / sqrt(2 ** precision) relative error (0.8% at 14)
+
+    def __init__(self, precision=DEFAULT_HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.registers = registers if registers is not None else array("B", bytes(1 << precision))
+
+    def add(self, item: str):
+        self.add_hash(_hash64(item))
+
+    def add_hash(self, h):
+        rest_bits = 64 - self.precision
+        idx = h >> rest_bits
+        rank = rest_bits - (h & ((1 << rest_bits) - 1)).bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def count(self):
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / math.fsum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small range correction, linear counting
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError(f"can't merge HyperLogLogs of precision {self.precision} and {other.precision}")
+        self.registers = array("B", map(max, self.registers, other.registers))
+
+    def as_dict(self):
+        return {"precision": self.precision, "registers": _pack(self.registers)}
+
+    @staticmethod
+    def from_dict(d):
+        return HyperLogLog(d["precision"], _unpack("B", d["registers"]))
+
+
+class CountMinSketch:
+    # Frequency estimate that never undercounts, overcounts by ~2 / width of the total at most
+
+    def __init__(self, width=DEFAULT_CMS_WIDTH, depth=DEFAULT_CMS_DEPTH, table=None, total=0):
+        self.width = width
+        self.depth = depth
+        self.table = table if table is not None else array("q", bytes(8 * width * depth))
+        self.total = total
+
+    def _cells(self, h):
+        # depth cells out of one 64 bit hash (Kirsch / Mitzenmacher)
+        h1, h2 = h & 0xFFFFFFFF, h >> 32
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in range(self.depth)]
+
+    def add(self, item: str, n=1):
+        self.add_hash(_hash64(item), n)
+
+    def add_hash(self, h, n=1):
+        table = self.table
+        for cell in self._cells(h):
+            table[cell] += n
+        self.total += n
+
+    def estimate(self, item: str):
+        table = self.table
+        return min(table[cell] for cell in self._cells(_hash64(item)))
+
+    def merge(self, other):
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError(f"can't merge Count-Min sketches of different sizes")
+        self.table = array("q", map(int.__add__, self.table, other.table))
+        self.total += other.total
+
+    def as_dict(self):
+        return {"width": self.width, "depth": self.depth, "total": self.total, "table": _pack(self.table)}
+
+    @staticmethod
+    def from_dict(d):
+        return CountMinSketch(d["width"], d["depth"], _unpack("q", d["table"]), d["total"])
+
+
+class TopK:
+    '''
+    Heavy hitters, space saving style: up to 2 * capacity counters, cut back to the top
+    capacity ones when full. An item showing up after a cut starts at floor (the largest
+    count cut so far), counts overestimate by floor at most.
+    '''
+
+    def __init__(self, k=DEFAULT_TOP_K, counts=None, floor=0):
+        self.k = k
+        self.capacity = 8 * k
+        self.counts = counts if counts is not None else dict()
+        self.floor = floor
+
+    def add(self, item: str, n=1):
+        counts = self.counts
+        if item in counts:
+            counts[item] += n
+            return
+        counts[item] = self.floor + n
+        if len(counts) > 2 * self.capacity:
+            self._cut()
+
+    def _cut(self):
+        ranked = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)
+        self.floor = max(self.floor, ranked[self.capacity][1])
+        self.counts = dict(ranked[:self.capacity])
+
+    def merge(self, other):
+        # Counts stay upper bounds, an item one side cut could have had up to its floor there
+        for item in self.counts.keys() - other.counts.keys():
+            self.counts[item] += other.floor
+        for item, n in other.counts.items():
+            self.counts[item] = self.counts.get(item, self.floor) + n
+        self.floor += other.floor
+        if len(self.counts) > 2 * self.capacity:
+            self._cut()
+
+    def top(self, k=None):
+        return Counter(self.counts).most_common(k or self.k)
+
+    def as_dict(self):
+        return {"k": self.k, "floor": self.floor, "counts": self.counts}
+
+    @staticmethod
+    def from_dict(d):
+        return TopK(d["k"], dict(d["counts"]), d["floor"])
+
+
+def path_prefix(path):
+    # First segment of a path, "/wp-admin/post.php" -> "/wp-admin"
+    return "/" + path.lstrip("/").split("/", 1)[0]
+
+
+def file_observations(robots):
+    '''
+    Input: parsed RobotsFile
+    Output: what --stats counts of it, small enough to hand back from a pool worker
+    '''
+    directives = Counter()
+    compliant = Counter()
+    disallowed = []
+    for d in robots.directives.values():
+        directives[d.directive] += 1
+        if d.compliance:
+            compliant[d.directive] += 1
+            if d.directive == "disallow" and d.value.get("path"):
+                disallowed.append(d.value["path"])
+    return {"directives": directives, "compliant": compliant,
+            "agents": [token.strip().lower() for dirID, token in robots.user_agents],
+            "disallowed": disallowed,
+            "paths": [path for path, dirID in invertedIndex.revealed_paths(robots.revealedPathTree)],
+            "urls": [url for dirID, url in robots.urlsFromComments]}
+
+
+class CorpusStats:
+    SKETCHED = ("agents", "paths", "disallowed", "urls")
+
+    def __init__(self, k=DEFAULT_TOP_K):
+        self.files = 0
+        self.errors = 0
+        self.classes = Counter()
+        self.directives = Counter()
+        self.compliant = Counter()
+        self.distinct = {name: HyperLogLog() for name in self.SKETCHED}
+        self.frequency = {name: CountMinSketch() for name in self.SKETCHED}
+        self.top = {name: TopK(k) for name in self.SKETCHED}
+        # Disallowed paths cut to their first segment, "top disallowed prefixes"
+        self.top["disallowed_prefixes"] = TopK(k)
+        # Hosts of the urls in comments
+        self.top["url_hosts"] = TopK(k)
+
+    def add_file(self, robotsClass, observations=None):
+        self.files += 1
+        self.classes[robotsClass] += 1
+        if observations is None:
+            # Classified without parsing (--classify-only, --sniff)
+            return
+        self.directives.update(observations["directives"])
+        self.compliant.update(observations["compliant"])
+        for name in self.SKETCHED:
+            distinct, frequency, top = self.distinct[name], self.frequency[name], self.top[name]
+            for item in observations[name]:
+                h = _hash64(item)
+                distinct.add_hash(h)
+                frequency.add_hash(h)
+                top.add(item)
+        for path in observations["disallowed"]:
+            self.top["disallowed_prefixes"].add(path_prefix(path))
+        for url in observations["urls"]:
+            try:
+                host = urlsplit(url if "//" in url else f"//{url}").hostname
+            except ValueError:
+                host = None
+            if host:
+                self.top["url_hosts"].add(host)
+
+    def add_error(self):
+        self.files += 1
+        self.errors += 1
+
+    def merge(self, other):
+        self.files += other.files
+        self.errors += other.errors
+        self.classes.update(other.classes)
+        self.directives.update(other.directives)
+        self.compliant.update(other.compliant)
+        for name in self.SKETCHED:
+            self.distinct[name].merge(other.distinct[name])
+            self.frequency[name].merge(other.frequency[name])
+        for name in self.top:
+            self.top[name].merge(other.top[name])
+
+    def estimate(self, name, item):
+        # How often item showed up in name ("agents", "paths", ...), never less than it did
+        return self.frequency[name].estimate(item)
+
+    def summary(self):
+        return {
+            "files": self.files,
+            "errors": self.errors,
+            "classes": dict(self.classes),
+            "directives": {name: {"count": n, "compliant": self.compliant[name],
+                                  "compliance_rate": self.compliant[name] / n}
+                           for name, n in self.directives.most_common()},
+            "distinct": {name: hll.count() for name, hll in self.distinct.items()},
+            "totals": {name: cms.total for name, cms in self.frequency.items()},
+            "top": {name: top.top() for name, top in self.top.items()},
+        }
+
+    def as_dict(self):
+        return {"summary": self.summary(),
+                "sketches": {"files": self.files, "errors": self.errors, "classes": self.classes,
+                             "directives": self.directives, "compliant": self.compliant,
+                             "distinct": {name: s.as_dict() for name, s in self.distinct.items()},
+                             "frequency": {name: s.as_dict() for name, s in self.frequency.items()},
+                             "top": {name: s.as_dict() for name, s in self.top.items()}}}
+
+    @staticmethod
+    def from_dict(d):
+        d = d["sketches"]
+        stats = CorpusStats()
+        stats.files, stats.errors = d["files"], d["errors"]
+        stats.classes = Counter(d["classes"])
+        stats.directives = Counter(d["directives"])
+        stats.compliant = Counter(d["compliant"])
+        stats.distinct = {name: HyperLogLog.from_dict(s) for name, s in d["distinct"].items()}
+        stats.frequency = {name: CountMinSketch.from_dict(s) for name, s in d["frequency"].items()}
+        stats.top = {name: TopK.from_dict(s) for name, s in d["top"].items()}
+        return stats
+
+    def save(self, path):
+        # Replaced in one go, a run killed mid save leaves the last one
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as statsOut:
+            json.dump(self.as_dict(), statsOut, indent=1)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def load(path):
+        with open(path, "r") as statsIn:
+            return CorpusStats.from_dict(json.load(statsIn))
+
+
+def parse_cmd():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("stats",
+                        nargs="+",
+                        help="--stats files of robotsParser.py runs / shards")
+    parser.add_argument("-o", "--output",
+                        required=False,
+                        default=None,
+                        help="write them merged into one stats file",
+                        dest="statsOut")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_cmd()
+    merged = CorpusStats.load(args.stats[0])
+    for path in args.stats[1:]:
+        merged.merge(CorpusStats.load(path))
+    if args.statsOut:
+        merged.save(args.statsOut)
+    print(json.dumps(merged.summary(), indent=1))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
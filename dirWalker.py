@@ -0,0 +1,55 @@
+import os
+from fnmatch import fnmatch
+
+# Never robots files: our own json output (--inplace) and editor swap files
+SKIP_SUFFIXES = (".json", ".swp")
+
+
+def _matches(patterns, name, rel_path):
+    # Patterns with a "/" are matched against the path relative to the walk root, others the name
+    return any(fnmatch(rel_path if "/" in pattern else name, pattern) for pattern in patterns)
+
+
+def walk(directory, include=None, exclude=None, min_size=None, max_size=None, skip_suffixes=SKIP_SUFFIXES):
+    '''
+    Lazily yields the absolute path of every file under directory (recursing, files of a
+    directory before its subdirectories, in directory order), nothing is listed up front.
+    include: globs a file has to match (any of), exclude: globs dropping files and
+    whole subdirectories, min / max_size: byte bounds (only then is a file stat'ed).
+    Names are checked before anything touches the inode, dir entry types come from
+    scandir itself. Symlinked directories aren't followed.
+    '''
+    # (absolute path, path relative to the root with a trailing "/")
+    stack = [(os.path.abspath(directory), "")]
+    while stack:
+        current, rel_dir = stack.pop()
+        subdirs = []
+        try:
+            entries = os.scandir(current)
+        except OSError:
+            # Vanished / unreadable shard, skip it rather than stopping the walk
+            continue
+        with entries:
+            for entry in entries:
+                name = entry.name
+                if name.endswith(skip_suffixes):
+                    continue
+                rel_path = rel_dir + name
+                if exclude and _matches(exclude, name, rel_path):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append((entry.path, rel_path + "/"))
+                    continue
+                if not entry.is_file():
+                    continue
+                if include and not _matches(include, name, rel_path):
+                    continue
+                if min_size is not None or max_size is not None:
+                    try:
+                        size = entry.stat().st_size
+                    except OSError:
+                        continue
+                    if (min_size is not None and size < min_size) or (max_size is not None and size > max_size):
+                        continue
+                yield entry.path
+        stack.extend(reversed(subdirs))
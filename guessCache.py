@@ -0,0 +1,65 @@
+import json
+from collections import OrderedDict
+
+DEFAULT_MAXSIZE = 65536
+
+
+class GuessCache:
+    '''
+    Bounded LRU cache of fuzzy guesses, raw directive token -> guessed directive (or None)
+    Tokens aren't normalized any further, distance_guess is case / whitespace sensitive
+    '''
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        # Guesses computed since the last pop_new(), only kept when asked for
+        self.record_new = False
+        self.new = dict()
+        self._entries = OrderedDict()
+
+    def _insert(self, token, guess):
+        self._entries[token] = guess
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def lookup(self, token, compute):
+        try:
+            guess = self._entries[token]
+        except KeyError:
+            self.misses += 1
+            guess = compute(token)
+            self._insert(token, guess)
+            if self.record_new:
+                self.new[token] = guess
+        else:
+            self.hits += 1
+            self._entries.move_to_end(token)
+        return guess
+
+    def warm(self, table: dict):
+        # Pre-warming doesn't count as hits / misses
+        for token, guess in table.items():
+            self._insert(token, guess)
+
+    def pop_new(self):
+        new, self.new = self.new, dict()
+        return new
+
+    def load(self, path):
+        with open(path, "r") as tableIn:
+            self.warm(json.load(tableIn))
+
+    def save(self, path):
+        with open(path, "w") as tableOut:
+            json.dump(dict(self._entries), tableOut)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries), "maxsize": self.maxsize}
+
+    def __len__(self):
+        return len(self._entries)
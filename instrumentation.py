@@ -0,0 +1,183 @@
+import functools
+import logging
+import pstats
+import threading
+import time
+from collections import Counter
+
+import RobotsDataClasses
+import outputWriter
+import reMe
+
+'''
+Opt in hot path timers / counters (robotsParser.py --instrument). install() swaps timing
+wrappers in for the functions in STAGES, nothing is wrapped (so nothing costs anything)
+without it. Per process, pool workers hand theirs back with pop() and the parent merge()s.
+    stage       calls / seconds of every STAGES function (nested ones count in their caller too)
+    directives  lines / compliant lines / seconds of classify_line per KNOWN_LINES key
+                (guessed directives by the guess, "unknown" for the rest), every parsed
+                line, line cache hits included (--parse-cache hits aren't parsed at all)
+'''
+
+logger = logging.getLogger(__name__)
+
+# stage -> (owner, attribute), robotsParser's functions are looked up through the module
+STAGES = {
+    "parse_robot_file": ("robotsParser", "parse_robot_file"),
+    "classify_line": ("robotsParser", "classify_line"),
+    "identify_line": ("robotsParser", "identify_line"),
+    "distance_guess": ("robotsParser", "_distance_guess"),
+    "add_comment": (RobotsDataClasses.RobotsFile, "add_comment"),
+    "add_path": (RobotsDataClasses.RobotsFile, "add_paths"),
+    "to_json": (RobotsDataClasses.RobotsFile, "to_json"),
+    "write": (outputWriter.OutputWriter, "write"),
+    "flush": (outputWriter.OutputWriter, "flush"),
+}
+
+enabled = False
+calls = Counter()
+seconds = Counter()
+lines = Counter()
+compliant = Counter()
+line_seconds = Counter()
+
+
+def _timed(stage, fn):
+    perf_counter = time.perf_counter
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            seconds[stage] += perf_counter() - start
+            calls[stage] += 1
+    return wrapper
+
+
+def _timed_classify_line(fn):
+    # classify_line gets every line (identify_line only the line cache misses), counted by
+    #   the LineResult it hands back
+    perf_counter = time.perf_counter
+
+    @functools.wraps(fn)
+    def wrapper(line):
+        start = perf_counter()
+        result = fn(line)
+        elapsed = perf_counter() - start
+        key = result.directive or "unknown"
+        lines[key] += 1
+        line_seconds[key] += elapsed
+        if result.compliance:
+            compliant[key] += 1
+        seconds["classify_line"] += elapsed
+        calls["classify_line"] += 1
+        return result
+    return wrapper
+
+
+def install(parser_module):
+    '''
+    Wraps every STAGES function, parser_module is robotsParser (it imports this module).
+    Only once per process.
+    '''
+    global enabled
+    if enabled:
+        return
+    for stage, (owner, name) in STAGES.items():
+        owner = parser_module if owner == "robotsParser" else owner
+        fn = getattr(owner, name)
+        setattr(owner, name, _timed_classify_line(fn) if stage == "classify_line" else _timed(stage, fn))
+    enabled = True
+
+
+def pop():
+    # This process' counts since the last pop(), for merge() in the parent
+    report = {"calls": dict(calls), "seconds": dict(seconds), "lines": dict(lines),
+              "compliant": dict(compliant), "line_seconds": dict(line_seconds)}
+    for counter in (calls, seconds, lines, compliant, line_seconds):
+        counter.clear()
+    return report
+
+
+def merge(report):
+    calls.update(report["calls"])
+    seconds.update(report["seconds"])
+    lines.update(report["lines"])
+    compliant.update(report["compliant"])
+    line_seconds.update(report["line_seconds"])
+
+
+def summary(files, errors, elapsed):
+    n_lines = calls["classify_line"]
+    return {
+        "files": files,
+        "errors": errors,
+        "elapsed": elapsed,
+        "files_per_s": files / elapsed if elapsed else 0.0,
+        "lines": n_lines,
+        "lines_per_s": n_lines / elapsed if elapsed else 0.0,
+        # Summed over every process, more than elapsed with --workers
+        "stages": {stage: {"calls": calls[stage], "seconds": seconds[stage]} for stage in STAGES},
+        "directives": {key: {"lines": n, "compliant": compliant[key], "seconds": line_seconds[key]}
+                       for key, n in lines.most_common()},
+        "timeouts": reMe.timeout_report(),
+    }
+
+
+class Progress:
+    '''
+    Logs files/s, lines/s and an ETA every interval seconds. The inputs are counted as
+    the run itself walks them (counted()), the ETA shows up once that walk is through,
+    or once count_inputs (a second walk, on a background thread) is counted.
+    '''
+
+    def __init__(self, interval, skipped=0, count_inputs=None):
+        self.interval = interval
+        self.total = None
+        self.walked = 0
+        self.skipped = skipped
+        self.start = time.monotonic()
+        self._last = self.start
+        if count_inputs is not None:
+            threading.Thread(target=self._count, args=(count_inputs,), daemon=True).start()
+
+    def _count(self, inputs):
+        total = sum(1 for _ in inputs)
+        if self.total is None:
+            self.total = total
+
+    def counted(self, inputs):
+        # Passes the run's inputs through, counting them
+        for item in inputs:
+            self.walked += 1
+            yield item
+        self.total = self.walked
+
+    def update(self, files):
+        now = time.monotonic()
+        if now - self._last < self.interval:
+            return
+        self._last = now
+        elapsed = now - self.start
+        rate = files / elapsed
+        message = f"{files} files, {rate:,.1f} files/s, {calls['classify_line'] / elapsed:,.0f} lines/s"
+        if self.total is not None and rate:
+            remaining = max(self.total - self.skipped - files, 0)
+            message += f", {remaining} to go, ETA {remaining / rate:,.0f}s"
+        else:
+            message += f", {self.walked} found so far"
+        logger.info(message)
+
+
+def profile_stages(profiler):
+    # stage -> {"calls", "seconds" (cumulative)} out of a cProfile run, main process only
+    stats = pstats.Stats(profiler).stats
+    out = dict()
+    for stage, (owner, name) in STAGES.items():
+        module = owner if isinstance(owner, str) else owner.__module__
+        for (filename, line, funcname), (cc, nc, tt, ct, callers) in stats.items():
+            if funcname == name and filename.endswith(f"{module}.py"):
+                out[stage] = {"calls": nc, "seconds": ct}
+    return out
@@ -0,0 +1,256 @@
+import argparse
+import os
+import sqlite3
+import sys
+from collections import Counter
+
+import RobotsDataClasses
+
+'''
+Corpus wide inverted index in SQLite, written during a run (robotsParser.py --inverted-index)
+so questions like "who disallows /admin" or "who names GPTBot" don't rescan the jsonl output:
+    files   filePath -> (domain, date)
+    paths   revealed path ("/a/b", as RobotsFile.revealedPathTree has it) -> (file, directive, id)
+    agents  lower case user agent token -> (file, id)
+directive / compliance are those of the directive the path / token came from, a path only in
+a directive's comment (full line or trailing) is a "comment" path. Files coming out of --parse-cache are indexed from their json,
+paths deeper than MAX_PATH_DEPTH end where the json cuts them.
+Indexes from separate runs / machines are merged with merge().
+'''
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, filePath TEXT UNIQUE, domain TEXT, date TEXT)",
+    "CREATE TABLE IF NOT EXISTS paths (path TEXT, file INTEGER, directive TEXT, id INTEGER, compliance INTEGER,"
+    " PRIMARY KEY (path, file, id)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS agents (token TEXT, file INTEGER, id INTEGER, compliance INTEGER,"
+    " PRIMARY KEY (token, file, id)) WITHOUT ROWID",
+    # Dropping / replacing a file's postings
+    "CREATE INDEX IF NOT EXISTS paths_file ON paths (file)",
+    "CREATE INDEX IF NOT EXISTS agents_file ON agents (file)",
+)
+
+
+def revealed_paths(trie):
+    # (path, dirID) of every path added to a PathTrie, where it ends is where more ids
+    #   go into a node than into its children
+    if trie is None:
+        return
+    stack = [("", trie.root)]
+    while stack:
+        prefix, node = stack.pop()
+        path = "/".join((prefix, node.key) + node.rest) if node is not trie.root else ""
+        ending = Counter(node.ids)
+        for child in node.children.values():
+            ending.subtract(child.ids)
+            stack.append((path, child))
+        for dirID, n in ending.items():
+            if n > 0 and dirID != -1:
+                yield path or "/", dirID
+
+
+def _path_key(path):
+    # Segments a path is compared on, a tree read from json stops at MAX_PATH_DEPTH
+    return tuple(seg for seg in path.split("/") if seg)[:RobotsDataClasses.MAX_PATH_DEPTH]
+
+
+def postings(robots):
+    '''
+    Input: parsed RobotsFile
+    Output: ([(path, directive, id, compliance), ...], [(token, id, compliance), ...])
+    '''
+    directives = robots.directives
+    # The path tree doesn't tell a directive's value from its comment, both go in under its id
+    comment_paths = dict()
+    for dirID, path in robots.pathsFromComments:
+        comment_paths.setdefault(dirID, set()).add(_path_key(path))
+    value_paths = dict()
+    paths = []
+    for path, dirID in revealed_paths(robots.revealedPathTree):
+        d = directives.get(dirID)
+        directive = d.directive if d else None
+        if d is not None and directive != "comment" and _path_key(path) in comment_paths.get(dirID, ()):
+            if dirID not in value_paths:
+                value_paths[dirID] = {_path_key(p) for p in robots.value_paths(d, strip_comment=True)}
+            if _path_key(path) not in value_paths[dirID]:
+                directive = "comment"
+        paths.append((path, directive, dirID, bool(d.compliance) if d else False))
+    agents = []
+    for dirID, token in robots.user_agents:
+        d = directives.get(dirID)
+        agents.append((token.strip().lower(), dirID, bool(d.compliance) if d else False))
+    return paths, agents
+
+
+def _prefix_range(prefix, segment=True):
+    # [low, high) of the paths under prefix, segment wise ("/admin" isn't under "/adm") or plain
+    if segment:
+        prefix = prefix.rstrip("/") + "/"
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class InvertedIndex:
+    '''
+    add() replaces a file's postings (a --resume'd file parsed again doesn't double up),
+    nothing is visible to other readers until commit()
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            self._db.execute(statement)
+
+    def _begin(self):
+        if not self._db.in_transaction:
+            self._db.execute("BEGIN")
+
+    def _file_id(self, filePath, domain, date):
+        row = self._db.execute("SELECT id FROM files WHERE filePath = ?", (filePath,)).fetchone()
+        if row is None:
+            return self._db.execute("INSERT INTO files (filePath, domain, date) VALUES (?, ?, ?)",
+                                    (filePath, domain, date)).lastrowid
+        self._db.execute("UPDATE files SET domain = ?, date = ? WHERE id = ?", (domain, date, row[0]))
+        self._db.execute("DELETE FROM paths WHERE file = ?", (row[0],))
+        self._db.execute("DELETE FROM agents WHERE file = ?", (row[0],))
+        return row[0]
+
+    def add(self, filePath, domain, date, filePostings):
+        self._begin()
+        fileID = self._file_id(filePath, domain, date)
+        paths, agents = filePostings
+        self._db.executemany("INSERT OR IGNORE INTO paths VALUES (?, ?, ?, ?, ?)",
+                             ((path, fileID, directive, dirID, compliance)
+                              for path, directive, dirID, compliance in paths))
+        self._db.executemany("INSERT OR IGNORE INTO agents VALUES (?, ?, ?, ?)",
+                             ((token, fileID, dirID, compliance) for token, dirID, compliance in agents))
+
+    def add_robots(self, robots):
+        date = robots.date.isoformat() if robots.date else None
+        self.add(robots.filePath, robots.domain, date, postings(robots))
+
+    def merge(self, shard_path):
+        '''
+        Folds another index in, its files replace the ones already here
+        '''
+        self._begin()
+        self._db.execute("ATTACH DATABASE ? AS shard", (shard_path,))
+        try:
+            self._db.execute("CREATE TEMP TABLE replaced AS SELECT f.id FROM files f JOIN shard.files s"
+                             " ON f.filePath = s.filePath")
+            self._db.execute("DELETE FROM paths WHERE file IN (SELECT id FROM temp.replaced)")
+            self._db.execute("DELETE FROM agents WHERE file IN (SELECT id FROM temp.replaced)")
+            self._db.execute("DROP TABLE temp.replaced")
+            self._db.execute("INSERT INTO files (filePath, domain, date) SELECT filePath, domain, date FROM shard.files"
+                             " WHERE true ON CONFLICT (filePath) DO UPDATE SET domain = excluded.domain,"
+                             " date = excluded.date")
+            self._db.execute("INSERT OR IGNORE INTO paths SELECT p.path, f.id, p.directive, p.id, p.compliance"
+                             " FROM shard.paths p JOIN shard.files s ON p.file = s.id"
+                             " JOIN files f ON f.filePath = s.filePath")
+            self._db.execute("INSERT OR IGNORE INTO agents SELECT a.token, f.id, a.id, a.compliance"
+                             " FROM shard.agents a JOIN shard.files s ON a.file = s.id"
+                             " JOIN files f ON f.filePath = s.filePath")
+            self._db.execute("COMMIT")
+        finally:
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+            self._db.execute("DETACH DATABASE shard")
+
+    def commit(self):
+        if self._db.in_transaction:
+            self._db.execute("COMMIT")
+
+    def paths(self, prefix, directive=None, segment=True, compliant=False):
+        '''
+        (filePath, domain, date, path, directive, id) of every path at or under prefix, by path.
+        segment: "/admin" only covers "/admin" and "/admin/...", off it's a plain string prefix
+        '''
+        low, high = _prefix_range(prefix, segment)
+        query = ("SELECT f.filePath, f.domain, f.date, p.path, p.directive, p.id FROM paths p"
+                 " JOIN files f ON p.file = f.id WHERE ((p.path >= ? AND p.path < ?) OR p.path = ?)")
+        params = [low, high, (prefix.rstrip("/") or "/") if segment else prefix]
+        if directive is not None:
+            query += " AND p.directive = ?"
+            params.append(directive)
+        if compliant:
+            query += " AND p.compliance"
+        return self._db.execute(query + " ORDER BY p.path, f.filePath, p.id", params)
+
+    def agents(self, token, compliant=False):
+        # (filePath, domain, date, id) of every user agent line naming token (case insensitive)
+        query = ("SELECT f.filePath, f.domain, f.date, a.id FROM agents a JOIN files f ON a.file = f.id"
+                 " WHERE a.token = ?")
+        if compliant:
+            query += " AND a.compliance"
+        return self._db.execute(query + " ORDER BY f.filePath, a.id", (token.strip().lower(),))
+
+    def domains(self, prefix, directive="disallow", segment=True):
+        # Domains with a directive (disallow by default) at or under prefix
+        return sorted({row[1] for row in self.paths(prefix, directive, segment)})
+
+    def stats(self):
+        return {table: self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("files", "paths", "agents")}
+
+    def close(self):
+        self.commit()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def parse_cmd():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--index",
+                        required=True,
+                        help="inverted index (robotsParser.py --inverted-index), created by --merge if missing",
+                        dest="index")
+    parser.add_argument("--merge",
+                        required=False,
+                        action="append",
+                        default=[],
+                        help="fold this index into -i first (repeatable), later ones win for the same filePath",
+                        dest="merge")
+    parser.add_argument("--path",
+                        required=False,
+                        default=None,
+                        help="print every file with a path at or under this prefix",
+                        dest="path")
+    parser.add_argument("--directive",
+                        required=False,
+                        default=None,
+                        help="only paths from this directive (disallow, allow, comment, ...)",
+                        dest="directive")
+    parser.add_argument("--agent",
+                        required=False,
+                        default=None,
+                        help="print every file with a user agent line naming this token",
+                        dest="agent")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_cmd()
+    if not args.merge and not os.path.exists(args.index):
+        print(f"{args.index} doesn't exist", file=sys.stderr)
+        return 1
+    with InvertedIndex(args.index) as index:
+        for shard in args.merge:
+            index.merge(shard)
+        if args.path:
+            for row in index.paths(args.path, args.directive):
+                print("\t".join(map(str, row)))
+        if args.agent:
+            for row in index.agents(args.agent):
+                print("\t".join(map(str, row)))
+        print(index.stats(), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+import bisect
+import json
+import mmap
+import os
+from datetime import datetime
+
+import RobotsDataClasses
+
+'''
+Sidecar index for the -o jsonl output, one json record per output line:
+    {"filePath": ..., "domain": ..., "date": isoformat, "offset": bytes, "length": bytes}
+offset / length cover the record without its newline, so a lookup is one slice
+of the memory mapped output instead of a scan
+'''
+
+
+def index_path(output_path):
+    return f"{output_path}.idx"
+
+
+def index_line(filePath, domain, date, offset, length):
+    return json.dumps({"filePath": filePath, "domain": domain, "date": date, "offset": offset, "length": length})
+
+
+def build_index(output_path, out_path=None):
+    '''
+    Indexes an existing jsonl output (e.g. from a run without --index) with one scan
+    '''
+    out_path = out_path or index_path(output_path)
+    offset = 0
+    with open(output_path, "rb") as jsonIn, open(out_path, "w") as indexOut:
+        for line in jsonIn:
+            record = line.rstrip(b"\n")
+            if record:
+                d = json.loads(record)
+                print(index_line(d["filePath"], d["domain"], d["date"], offset, len(record)), file=indexOut)
+            offset += len(line)
+    return out_path
+
+
+def index_matches(output_path, idx_path=None):
+    '''
+    Whether the index still describes output_path: its last record ends where the output
+    does and its first / last records are where it says, False for a missing index.
+    Catches an output overwritten (or appended to) after its index was written.
+    '''
+    idx_path = idx_path or index_path(output_path)
+    if not os.path.exists(idx_path):
+        return False
+    entries = []
+    with open(idx_path, "r") as indexIn:
+        for line in indexIn:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    size = os.path.getsize(output_path)
+    if not entries:
+        return size == 0
+    last = entries[-1]
+    # The last record's newline is the end of the output, build_index takes one without it too
+    if size - (last["offset"] + last["length"]) not in (0, 1):
+        return False
+    with open(output_path, "rb") as jsonIn:
+        for entry in (entries[0], last):
+            jsonIn.seek(entry["offset"])
+            record = jsonIn.read(entry["length"])
+            if jsonIn.read(1) not in (b"\n", b""):
+                return False
+            try:
+                if json.loads(record)["filePath"] != entry["filePath"]:
+                    return False
+            except (ValueError, KeyError, TypeError):
+                return False
+    return True
+
+
+class IndexedJsonl:
+    '''
+    Random access to a jsonl output through its index, records are only decoded
+    (RobotsFile.from_json) when asked for. Later records for the same filePath win.
+    '''
+
+    def __init__(self, output_path, idx_path=None):
+        self.by_file = dict()
+        # domain -> sorted [(date, offset, length), ...]
+        self.by_domain = dict()
+        with open(idx_path or index_path(output_path), "r") as indexIn:
+            for line in indexIn:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Partial last line from a run that died mid write
+                    continue
+                span = (entry["offset"], entry["length"])
+                self.by_file[entry["filePath"]] = span
+                self.by_domain.setdefault(entry["domain"], []).append((entry["date"],) + span)
+        for snapshots in self.by_domain.values():
+            snapshots.sort()
+
+        self._in = open(output_path, "rb")
+        # mmap can't map an empty file
+        self._map = mmap.mmap(self._in.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(output_path) else b""
+
+    def raw(self, offset, length) -> bytes:
+        return self._map[offset:offset + length]
+
+    def decode(self, offset, length):
+        return RobotsDataClasses.RobotsFile.from_json(json.loads(self.raw(offset, length)))
+
+    def get(self, filePath):
+        span = self.by_file.get(filePath)
+        return None if span is None else self.decode(*span)
+
+    def snapshots(self, domain):
+        # [(date, offset, length), ...] oldest first
+        return self.by_domain.get(domain, [])
+
+    def get_domain(self, domain, date=None):
+        '''
+        The domain's record from date (datetime or isoformat string), the latest one
+        at or before it if there's no exact match, None if there's nothing that old.
+        Without a date, the newest record.
+        '''
+        snapshots = self.snapshots(domain)
+        if isinstance(date, datetime):
+            date = date.isoformat()
+        if date is not None:
+            # inf sorts after any offset so an exact date match is included
+            snapshots = snapshots[:bisect.bisect_right(snapshots, (date, float("inf")))]
+        if not snapshots:
+            return None
+        return self.decode(*snapshots[-1][1:])
+
+    def __len__(self):
+        return len(self.by_file)
+
+    def close(self):
+        if self._map:
+            self._map.close()
+        self._in.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,45 @@
+from collections import OrderedDict
+
+DEFAULT_MAXSIZE = 65536
+# Longer lines aren't cached (HTML / path dumps), keeps the cache's memory bounded
+MAX_LINE_LENGTH = 512
+
+
+class LineCache:
+    '''
+    Bounded LRU cache of classified lines, exact line text -> LineResult
+    maxsize 0 turns it off
+    '''
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, max_line_length=MAX_LINE_LENGTH):
+        self.maxsize = maxsize
+        self.max_line_length = max_line_length
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, line):
+        try:
+            result = self._entries[line]
+        except KeyError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(line)
+        return result
+
+    def put(self, line, result):
+        if not self.maxsize or len(line) > self.max_line_length:
+            return
+        self._entries[line] = result
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries), "maxsize": self.maxsize}
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,70 @@
+import os
+import time
+
+DEFAULT_FLUSH_BYTES = 1 << 20
+DEFAULT_FLUSH_INTERVAL = 5.0
+
+
+class OutputWriter:
+    '''
+    One long lived handle per output file (jsonl output, class files, error list),
+    whole lines are buffered in memory and written out once flush_bytes are pending
+    or flush_interval seconds passed since the last flush, and on close.
+    sizes[path] is the size the file has once everything written so far is flushed.
+    after_flush callbacks run once every sink is flushed (e.g. checkpointing).
+    '''
+
+    def __init__(self, flush_bytes=DEFAULT_FLUSH_BYTES, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.sizes = dict()
+        self.after_flush = []
+        self._files = dict()
+        self._buffers = dict()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def _open(self, path):
+        sinkOut = open(path, "ab", buffering=0)
+        self._files[path] = sinkOut
+        self._buffers[path] = []
+        self.sizes[path] = sinkOut.seek(0, os.SEEK_END)
+
+    def write(self, path, line: str):
+        # Returns the offset the line starts at in the file
+        if path not in self._files:
+            self._open(path)
+        offset = self.sizes[path]
+        data = f"{line}\n".encode("utf-8", "surrogateescape")
+        self._buffers[path].append(data)
+        self.sizes[path] += len(data)
+        self._pending += len(data)
+
+        if self._pending >= self.flush_bytes or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+        return offset
+
+    def flush(self):
+        for path, buffered in self._buffers.items():
+            if buffered:
+                data = memoryview(b"".join(buffered))
+                while data:
+                    data = data[self._files[path].write(data):]
+                buffered.clear()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        for callback in self.after_flush:
+            callback()
+
+    def close(self):
+        self.flush()
+        for sinkOut in self._files.values():
+            sinkOut.close()
+        self._files.clear()
+        self._buffers.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
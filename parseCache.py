@@ -0,0 +1,152 @@
+import hashlib
+import io
+import json
+import os
+import sqlite3
+
+import Levenshtein
+
+import RobotsDataClasses
+
+# Bump when parsing changes in a way the source fingerprint can't see
+PARSER_VERSION = 1
+# Modules whose source decides what a file parses to
+FINGERPRINT_MODULES = ("rfcRegexes", "robotsParser", "RobotsDataClasses", "reMe", "uriScanner",
+                       "guessCache", "lineCache")
+# Stands in for the per file metadata while a record is turned into a template
+_SENTINEL = "\x00robots-parse-cache\x00"
+
+
+def fingerprint(guess_table=None):
+    h = hashlib.sha256(f"{PARSER_VERSION} {Levenshtein.__version__}".encode())
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in FINGERPRINT_MODULES:
+        with open(os.path.join(here, f"{name}.py"), "rb") as srcIn:
+            h.update(hashlib.sha256(srcIn.read()).digest())
+    # A --guess-table's guesses are taken as is, a different table can parse differently
+    if guess_table and os.path.exists(guess_table):
+        with open(guess_table, "rb") as tableIn:
+            h.update(b"guess-table" + hashlib.sha256(tableIn.read()).digest())
+    return h.hexdigest()
+
+
+'''
+Input: file path, wayback (first line is the wayback header), special rules start / end, json backend,
+       data (content of an archive member)
+Output: (key, header line) key hashes the body only, so snapshots / domains serving the
+        same robots.txt share it. None as header without wayback
+'''
+def content_key(path, wayback=False, start=None, end=None, backend="json", data=None):
+    h = hashlib.blake2b(f"{start}:{end}:{bool(wayback)}:{backend}\n".encode(), digest_size=20)
+    header = None
+    with (open(path, "rb") if data is None else io.BytesIO(data)) as rIn:
+        if wayback:
+            # Decoded like the text mode parse does, a bad header fails the same way
+            header = rIn.readline().decode("utf-8").strip()
+        for block in iter(lambda: rIn.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest(), header
+
+
+def json_template(robots, backend="json"):
+    '''
+    robots' json split around its META_FIELDS values, None if it can't be split
+    (a sentinel showing up in the content)
+    '''
+    d = robots.as_dict()
+    for name in RobotsDataClasses.RobotsFile.META_FIELDS:
+        d[name] = _SENTINEL + name
+    text = RobotsDataClasses.json_dumps(d, backend=backend)
+    parts = []
+    for name in RobotsDataClasses.RobotsFile.META_FIELDS:
+        marker = RobotsDataClasses.json_dumps(_SENTINEL + name, backend=backend)
+        if text.count(marker) != 1:
+            return None
+        before, text = text.split(marker)
+        parts.append(before)
+    parts.append(text)
+    return parts
+
+
+def fill_template(parts, robots, backend="json"):
+    # Same as robots.to_json(backend=backend) for a file that parsed to the template
+    out = [parts[0]]
+    for name, part in zip(RobotsDataClasses.RobotsFile.META_FIELDS, parts[1:]):
+        out.append(RobotsDataClasses.json_dumps(getattr(robots, name), backend=backend))
+        out.append(part)
+    return "".join(out)
+
+
+class ParseCache:
+    '''
+    Persistent content hash -> (guess_if_robots class, json template) store in SQLite.
+    Emptied when the fingerprint (parser / regex / cache source, PARSER_VERSION, the
+    guess_table loaded into the guess cache) changes.
+    Workers only read, new entries are kept in memory until pop_new() hands them to
+    the process writing the store (put / commit).
+    '''
+
+    def __init__(self, path, guess_table=None):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.new = dict()
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # Write lock up front, workers open the store at the same time
+        self._db.execute("BEGIN IMMEDIATE")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, class TEXT, template TEXT)")
+        current = fingerprint(guess_table)
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'fingerprint'").fetchone()
+        if row is None or row[0] != current:
+            self._db.execute("DELETE FROM entries")
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (current,))
+        self._db.execute("COMMIT")
+
+    def get(self, key, template=True):
+        # (class, template parts or None), None on a miss. Entries from --classify-only
+        #   runs have no template, they're a miss when one is needed
+        entry = self.new.get(key)
+        if entry is None:
+            row = self._db.execute("SELECT class, template FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                entry = (row[0], None if row[1] is None else json.loads(row[1]))
+        if entry is not None and template and entry[1] is None:
+            entry = None
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def record(self, key, robotsClass, parts):
+        self.new[key] = (robotsClass, parts)
+
+    def pop_new(self):
+        new, self.new = self.new, dict()
+        return new
+
+    def put_many(self, entries: dict):
+        if not entries:
+            return
+        if not self._db.in_transaction:
+            self._db.execute("BEGIN")
+        self._db.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                             ((key, robotsClass, None if parts is None else json.dumps(parts))
+                              for key, (robotsClass, parts) in entries.items()))
+
+    def commit(self):
+        self.put_many(self.pop_new())
+        if self._db.in_transaction:
+            self._db.execute("COMMIT")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]}
+
+    def close(self):
+        self.commit()
+        self._db.close()
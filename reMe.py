@@ -1,7 +1,18 @@
+import logging
+import os
 import signal
 import re
+import sys
+import threading
+import multiprocessing
+from collections import Counter
+from contextlib import contextmanager
 
 TIMEOUT = 5
+# Watchdog period in seconds, a regex call is interrupted after running for more than TIMEOUT of these
+TICK = 1
+# Default budget for a whole call run through an IsolatedWorker
+ISOLATED_TIMEOUT = 60
 
 # Credit to: https://www.saltycrane.com/blog/2010/04/using-python-timeout-decorator-uploading-s3/
 class TimeoutError(Exception):
@@ -10,76 +21,235 @@ class TimeoutError(Exception):
     def __str__(self):
         return repr(self.value)
 
-def timeout(seconds_before_timeout):
-    def decorate(f):
-        def handler(signum, frame):
-            raise TimeoutError()
-        def new_f(*args, **kwargs):
-            old = signal.signal(signal.SIGALRM, handler)
-            signal.alarm(seconds_before_timeout)
-            try:
-                result = f(*args, **kwargs)
-            finally:
-                # reinstall the old signal handler
-                signal.signal(signal.SIGALRM, old)
-                # cancel the alarm
-                # this line should be inside the "finally" block (per Sam Kortchmar)
-                signal.alarm(0)
-            return result
-        new_f.__name__ = f.__name__
-        return new_f
-    return decorate
-
 # End Credit
 
-@timeout(TIMEOUT)
-def _match(*args, **kwargs):
-    return re.match(*args, **kwargs)
+# "file:line function" of the caller -> number of calls that timed out
+timeouts = Counter()
+
+logger = logging.getLogger(__name__)
+
+_main_thread_ident = threading.main_thread().ident
+_watchdog_depth = 0
+_old_handler = None
+_ticks = 0
+_call_start = None
+# Timer armed by a call outside any watchdog() block, it disarms itself after a tick with no calls
+_auto_armed = False
+_calls = 0
+_calls_at_last_tick = 0
+_warned_threads = False
+
+
+def _tick(signum, frame):
+    global _ticks, _call_start, _auto_armed, _calls_at_last_tick
+    _ticks += 1
+    if _call_start is not None and _ticks - _call_start > TIMEOUT / TICK:
+        # Only one TimeoutError per call, a later tick can't hit its cleanup
+        _call_start = None
+        raise TimeoutError()
+    if _auto_armed and _call_start is None and _calls == _calls_at_last_tick:
+        _auto_armed = False
+        _disarm()
+    _calls_at_last_tick = _calls
+
+
+def _arm():
+    global _old_handler
+    _old_handler = signal.signal(signal.SIGALRM, _tick)
+    signal.setitimer(signal.ITIMER_REAL, TICK, TICK)
+
+
+def _disarm():
+    signal.setitimer(signal.ITIMER_REAL, 0)
+    signal.signal(signal.SIGALRM, _old_handler)
+
+
+@contextmanager
+def watchdog():
+    '''
+    Arms one interval timer for the whole block instead of an alarm per regex call,
+    every reMe call inside the block only records the tick it started on.
+    Reentrant, only the outermost block touches the signal handler / timer.
+    Signals are only delivered to the main thread, on other threads this is a no-op
+    (use an IsolatedWorker there).
+    '''
+    global _watchdog_depth, _auto_armed
+    if threading.get_ident() != _main_thread_ident:
+        yield
+        return
+
+    if _watchdog_depth == 0:
+        if _auto_armed:
+            # Already ticking for calls outside a block, this block owns the timer now
+            _auto_armed = False
+        else:
+            _arm()
+    _watchdog_depth += 1
+    try:
+        yield
+    finally:
+        _watchdog_depth -= 1
+        if _watchdog_depth == 0:
+            _disarm()
 
 
-def match(*args, **kwargs):
-    try:
-        return _match(*args, **kwargs)
-    except TimeoutError:
-        return None
+def _after_fork():
+    # Timers aren't inherited, a child forked while one was armed (a watchdog() block, or
+    #   from a pool's thread) starts over with none, its main thread being the forking one
+    global _main_thread_ident, _watchdog_depth, _auto_armed, _call_start
+    if _watchdog_depth or _auto_armed:
+        signal.signal(signal.SIGALRM, _old_handler)
+    _main_thread_ident = threading.main_thread().ident
+    _watchdog_depth = 0
+    _auto_armed = False
+    _call_start = None
 
 
-@timeout(TIMEOUT)
-def _search(*args, **kwargs):
-    return re.search(*args, **kwargs)
+os.register_at_fork(after_in_child=_after_fork)
 
-def search(*args, **kwargs):
+
+def _record_timeout(frame):
+    timeouts[f"{frame.f_code.co_filename}:{frame.f_lineno} {frame.f_code.co_name}"] += 1
+
+
+def _run(f, args, kwargs):
+    global _call_start, _calls
+    _calls += 1
+    _call_start = _ticks
     try:
-        return _search(*args, **kwargs)
+        result = f(*args, **kwargs)
+        # Cleared while still in the try, a tick landing after this can't kill the finished call
+        #   (one landing before it is caught below, the call did run over)
+        _call_start = None
+        return result
     except TimeoutError:
+        # Caller of match/search/... is three frames up
+        _record_timeout(sys._getframe(3))
         return None
+    finally:
+        _call_start = None
+
+
+def _guarded(f, *args, **kwargs):
+    global _auto_armed, _warned_threads
+    if threading.get_ident() != _main_thread_ident:
+        # Can't be interrupted off the main thread
+        if not _warned_threads:
+            _warned_threads = True
+            logger.warning("reMe calls off the main thread run without a timeout, use a reMe.IsolatedWorker there")
+        return f(*args, **kwargs)
+
+    if not _watchdog_depth and not _auto_armed:
+        # Outside a watchdog() block, the timer stays armed until a tick goes by without calls
+        _arm()
+        _auto_armed = True
+    return _run(f, args, kwargs)
 
 
-@timeout(TIMEOUT)
-def _fullmatch(*args, **kwargs):
-    return re.fullmatch(*args, **kwargs)
+def timeout_report():
+    return dict(timeouts)
+
+
+def reset_timeouts():
+    timeouts.clear()
+
+
+def match(*args, **kwargs):
+    return _guarded(re.match, *args, **kwargs)
+
+
+def search(*args, **kwargs):
+    return _guarded(re.search, *args, **kwargs)
+
 
 def fullmatch(*args, **kwargs):
-    try:
-        return _fullmatch(*args, **kwargs)
-    except TimeoutError:
-        return None
+    return _guarded(re.fullmatch, *args, **kwargs)
+
 
-@timeout(TIMEOUT)
-def _findall(*args, **kwargs):
-    return re.findall(*args, **kwargs)
 def findall(*args, **kwargs):
-    try:
-        return _findall(*args, **kwargs)
-    except TimeoutError:
-        return None
+    return _guarded(re.findall, *args, **kwargs)
 
 
-@timeout(TIMEOUT)
-def _sub(*args, **kwargs):
-    return re.sub(*args, **kwargs)
 def sub(*args, **kwargs):
-    try:
-        return _sub(*args, **kwargs)
-    except TimeoutError:
-        return None
+    return _guarded(re.sub, *args, **kwargs)
+
+
+def _isolated_loop(conn):
+    # Startup (spawn + imports) isn't charged to the first call's budget
+    conn.send(None)
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        f, args, kwargs = task
+        with watchdog():
+            try:
+                result = (True, f(*args, **kwargs))
+            except Exception as e:
+                result = (False, e)
+        try:
+            conn.send(result + (timeout_report(),))
+        except Exception as e:
+            # Result couldn't be pickled
+            conn.send((False, e, timeout_report()))
+        reset_timeouts()
+
+
+class IsolatedWorker:
+    '''
+    Runs calls in a long lived child process and kills it if a call overruns,
+    usable from any thread (calls on one worker are serialized).
+    The child guards its own regex calls with a watchdog, its timeout counts are
+    merged into this process' timeouts.
+    '''
+
+    def __init__(self, timeout=ISOLATED_TIMEOUT):
+        self.timeout = timeout
+        self._ctx = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._proc = None
+        self._conn = None
+
+    def _start(self):
+        self._conn, child_conn = self._ctx.Pipe()
+        self._proc = self._ctx.Process(target=_isolated_loop, args=(child_conn,), daemon=True)
+        self._proc.start()
+        child_conn.close()
+        self._conn.recv()
+
+    def _kill(self):
+        self._proc.kill()
+        self._proc.join()
+        self._conn.close()
+        self._proc = None
+        self._conn = None
+
+    def run(self, f, *args, **kwargs):
+        with self._lock:
+            if self._proc is None:
+                self._start()
+            self._conn.send((f, args, kwargs))
+            if not self._conn.poll(self.timeout):
+                self._kill()
+                timeouts[f"isolated {f.__module__}.{f.__qualname__}"] += 1
+                raise TimeoutError(f"{f.__qualname__} ran over {self.timeout}s")
+            ok, result, child_timeouts = self._conn.recv()
+            timeouts.update(child_timeouts)
+            if not ok:
+                raise result
+            return result
+
+    def close(self):
+        with self._lock:
+            if self._proc is not None:
+                self._conn.send(None)
+                self._proc.join()
+                self._conn.close()
+                self._proc = None
+                self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -5,6 +5,30 @@ ngroup_comp_reg = re.compile(ngroup_reg)
 def get_ngroups(s: str):
     return re.findall(ngroup_comp_reg,s)
 
+'''
+Building the patterns below is cheap, compiling them isn't (the absuri / host ones are
+most of it), so the compiled_* regexes and KNOWN_LINES entries are only compiled the first
+time they're used. warm() compiles all of them up front (pool workers, before forking).
+'''
+# compiled_* name -> (pattern, flags), compiled by the module __getattr__ on first access
+_lazy_patterns = dict()
+
+
+def lazy_compile(name, pattern, flags=0):
+    _lazy_patterns[name] = (pattern, flags)
+
+
+def __getattr__(name):
+    if name not in _lazy_patterns:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # Stored as a module global, later lookups don't come through here
+    compiled = globals()[name] = re.compile(*_lazy_patterns[name])
+    return compiled
+
+
+def compiled(name):
+    return globals().get(name) or __getattr__(name)
+
 scheme = '[a-zA-Z][a-zA-Z0-9+\\-.]*'
 unreserved = '[a-zA-Z0-9\\-._~]'
 pct_encoded = '%[0-9A-Fa-f][0-9A-Fa-f]'
@@ -45,7 +69,9 @@ hier_part_no_leading = f'(?:{force_authority}{path_abempty})'
 query = f'(?:{pchar}|[/?])*'
 
 absuri = f'{scheme}:{hier_part}(?:\\?{query})?'
-compiled_absuri = re.compile(absuri)
+lazy_compile("compiled_absuri", absuri)
+# absuri after its "scheme:" (uriScanner anchors it there)
+lazy_compile("compiled_absuri_after_scheme", f'{hier_part}(?:\\?{query})?')
 
 ws = '[ \t]'
 
@@ -53,11 +79,11 @@ ws = '[ \t]'
 custom_domain = f'{ws}*(?:[a-zA-Z0-9-]+\\.)+[a-zA-Z0-9-]+{ws}*'
 
 no_scheme_uri = f'({scheme}:)?{hier_part_no_leading}(?:\\?{query})?'
-compiled_no_scheme_uri = re.compile(custom_domain)
+lazy_compile("compiled_no_scheme_uri", custom_domain)
 
 identifier = '[\\-A-Z_a-z]+'
 product_token = f'(?:{identifier}|\\*)'
-complied_product_token = re.compile(product_token)
+lazy_compile("complied_product_token", product_token)
 utf8_1_noctl = '[!"$-\\x7f]'
 utf8_tail = '[\\x80-\\xbf]'
 utf8_2 = f'[\\xc2-\\xdf]{utf8_tail}'
@@ -71,17 +97,17 @@ utf8_4 = (
 )
 utf8_char_noctl = f'(?:{utf8_1_noctl}|{utf8_2}|{utf8_3}|{utf8_4})'
 path_pattern = f'/(?:{utf8_char_noctl})*'
-complied_path_pattern = re.compile(path_pattern)
+lazy_compile("complied_path_pattern", path_pattern)
 empty_pattern = f'(?:{ws})*'
 comment = f'\\#(?:{utf8_char_noctl}|{ws}|\\#)*'
-compiled_comment_val = re.compile(comment)
+lazy_compile("compiled_comment_val", comment)
 nl = '(?:[\r\n]|\\\r\\\n)'
 eol = f'(?:{ws})*({comment})?{nl}'
 
 commentline = f'(?P<comment>{comment})(?P<eolComment>{eol})'
 
 acap_val = f'(?P<val>{product_token}|({path_pattern}|{empty_pattern}))'
-compiled_acap_val = re.compile(acap_val)
+lazy_compile("compiled_acap_val", acap_val)
 acap = (
     f'(?:{ws})*(?P<directive>acap-[\\-a-zA-Z]*)(?:{ws})*:(?:{ws})*{acap_val}(?P<eolComment>{eol})'
 )
@@ -95,14 +121,14 @@ block = f'(?:{ws})*(?P<directive>block)(?:{ws})*:(?:{ws})*(?P<path>{path_pattern
 
 param_vals = '[A-Za-z0-9./*_]*'
 full_cparam_vals = f'(?P<param1>{param_vals})(?P<paramS>(?:\\&{param_vals})*)(?:{ws})*(?P<path>{path_pattern}|{empty_pattern})'
-compiled_full_cparam_vals = re.compile(full_cparam_vals)
+lazy_compile("compiled_full_cparam_vals", full_cparam_vals)
 
 clean_param = (
     f'(?:{ws})*(?P<directive>clean-param)(?:{ws})*:(?:{ws})*{full_cparam_vals}(?P<eolComment>{eol})'
 )
 
 crawl_delay = f'(?:{ws})*(?P<directive>crawl-delay)(?:{ws})*:(?:{ws})*(?P<delay>[0-9]*)(?P<eolComment>{eol})'
-compiled_crawl_delay_val = re.compile("[0-9]*")
+lazy_compile("compiled_crawl_delay_val", "[0-9]*")
 
 disallow = f'(?:{ws})*(?P<directive>disallow)(?:{ws})*:(?:{ws})*(?P<path>{path_pattern}|{empty_pattern})(?P<eolComment>{eol})'
 
@@ -113,10 +139,10 @@ startgroupline = f'(?:{ws})*(?P<directive>user-agent)(?:{ws})*:(?:{ws})*(?P<toke
 group = f'{startgroupline}(?:{startgroupline}|{emptyline})*(?:{rule}|{emptyline})*'
 
 host_directive = f'(?:{ws})*(?P<directive>host)(?:{ws})*:(?:{ws})*(?P<uri>{absuri}|{host})(?P<eolComment>{eol})'
-compiled_host_dir_val = re.compile(f'({absuri}|{host})')
+lazy_compile("compiled_host_dir_val", f'({absuri}|{host})')
 
 host_loads_val = f'(?P<duration>[0-9]*)'
-compiled_host_loads_val = re.compile(host_loads_val)
+lazy_compile("compiled_host_loads_val", host_loads_val)
 host_loads = f'(?:{ws})*(?P<directive>host-loads)(?:{ws})*:(?:{ws})*{host_loads_val}(?P<eolComment>{eol})'
 
 ignore = f'(?:{ws})*(?P<directive>ignore)(?:{ws})*:(?:{ws})*(?P<path>{path_pattern}|{empty_pattern})(?P<eolComment>{eol})'
@@ -141,7 +167,7 @@ rr_val = f'(?P<rate>[0-9]*)/(?P<time>[0-9]*)(?P<units>[sS]|[mM]|[hH]|[dD])(?:{ws
 request_rate = (
     f'(?:{ws})*(?P<directive>request-rate)(?:{ws})*:(?:{ws})*{rr_val}(?P<eolComment>{eol})'
 )
-complied_request_rate_val = re.compile(rr_val)
+lazy_compile("complied_request_rate_val", rr_val)
 
 reserved = f'(?:{gen_delims}|{sub_delims})'
 robotstxt = f'(?:{group}|{emptyline})*'
@@ -154,31 +180,102 @@ sitemap = f'(?:{ws})*(?P<directive>sitemap)(?:{ws})*:(?:{ws})*(?P<uri>{absuri})(
 user_agent = f'{startgroupline}'
 
 visit_time_val = f'(?P<time>[0-9]{{2}}:[0-9]{{2}}-[0-9]{{2}}:[0-9]{{2}})'
-compiled_visit_time_val = re.compile(visit_time_val)
+lazy_compile("compiled_visit_time_val", visit_time_val)
 visit_time = (
     f'(?:{ws})*(?P<directive>visit-time)(?:{ws})*:(?:{ws})*{visit_time_val}(?P<eolComment>{eol})'
 )
 
-compiled_paths = re.compile(f'({path_pattern}|{empty_pattern})')
-
-
-KNOWN_LINES = {'user-agent': (re.compile(user_agent, re.IGNORECASE), get_ngroups(user_agent), complied_product_token),
-               'crawl-delay': (re.compile(crawl_delay, re.IGNORECASE), get_ngroups(crawl_delay), compiled_crawl_delay_val),
-               'request-rate': (re.compile(request_rate, re.IGNORECASE), get_ngroups(request_rate), complied_request_rate_val ),
-               'allow': (re.compile(allow, re.IGNORECASE), get_ngroups(allow), compiled_paths),
-               'disallow': (re.compile(disallow, re.IGNORECASE), get_ngroups(disallow), compiled_paths),
-               'block': (re.compile(block, re.IGNORECASE), get_ngroups(block), compiled_paths),
-               'noindex': (re.compile(noindex, re.IGNORECASE), get_ngroups(noindex), compiled_paths),
-               'nosnippet': (re.compile(nosnippet, re.IGNORECASE), get_ngroups(nosnippet), compiled_paths),
-               'sitemap': (re.compile(sitemap, re.IGNORECASE), get_ngroups(sitemap), compiled_absuri),
-               '-sitemap': (re.compile(sitemapExtra, re.IGNORECASE), get_ngroups(sitemapExtra), compiled_absuri),
-               'host': (re.compile(host_directive, re.IGNORECASE), get_ngroups(host_directive), compiled_host_dir_val),
-               'ignore': (re.compile(ignore, re.IGNORECASE), get_ngroups(ignore), compiled_paths),
-               'clean-param': (re.compile(clean_param, re.IGNORECASE), get_ngroups(clean_param), compiled_full_cparam_vals),
-               'host-load': (re.compile(host_loads, re.IGNORECASE), get_ngroups(host_loads), compiled_host_loads_val),
-               'visit-time': (re.compile(visit_time, re.IGNORECASE), get_ngroups(visit_time), compiled_visit_time_val),
-               'noarchive': (re.compile(noarchive, re.IGNORECASE), get_ngroups(noarchive), compiled_paths),
-               'nofollow': (re.compile(nofollow, re.IGNORECASE), get_ngroups(nofollow), compiled_paths),
-               'acap-': (re.compile(acap, re.IGNORECASE), get_ngroups(acap), compiled_acap_val),
-               'comment': (re.compile(commentline, re.IGNORECASE), get_ngroups(commentline), compiled_comment_val)
-               }
+lazy_compile("compiled_paths", f'({path_pattern}|{empty_pattern})')
+
+
+# KNOWN_LINES key -> (line pattern, compiled_* name of its value regex)
+_known_lines = {'user-agent': (user_agent, 'complied_product_token'),
+                'crawl-delay': (crawl_delay, 'compiled_crawl_delay_val'),
+                'request-rate': (request_rate, 'complied_request_rate_val'),
+                'allow': (allow, 'compiled_paths'),
+                'disallow': (disallow, 'compiled_paths'),
+                'block': (block, 'compiled_paths'),
+                'noindex': (noindex, 'compiled_paths'),
+                'nosnippet': (nosnippet, 'compiled_paths'),
+                'sitemap': (sitemap, 'compiled_absuri'),
+                '-sitemap': (sitemapExtra, 'compiled_absuri'),
+                'host': (host_directive, 'compiled_host_dir_val'),
+                'ignore': (ignore, 'compiled_paths'),
+                'clean-param': (clean_param, 'compiled_full_cparam_vals'),
+                'host-load': (host_loads, 'compiled_host_loads_val'),
+                'visit-time': (visit_time, 'compiled_visit_time_val'),
+                'noarchive': (noarchive, 'compiled_paths'),
+                'nofollow': (nofollow, 'compiled_paths'),
+                'acap-': (acap, 'compiled_acap_val'),
+                'comment': (commentline, 'compiled_comment_val')
+                }
+
+# KNOWN_LINES key -> named groups of its line regex
+KNOWN_GROUPS = {key: get_ngroups(line) for key, (line, _) in _known_lines.items()}
+
+
+class LazyLines(dict):
+    '''
+    KNOWN_LINES, key -> (line regex (IGNORECASE), named groups, value regex).
+    Every key is there from the start (iteration, in, len, in _known_lines order) but a
+    key's regexes are only compiled by its first lookup, after that it's a plain dict hit.
+    '''
+
+    def __missing__(self, key):
+        line, valueName = _known_lines[key]
+        entry = self[key] = (re.compile(line, re.IGNORECASE), KNOWN_GROUPS[key], compiled(valueName))
+        return entry
+
+    def __iter__(self):
+        return iter(_known_lines)
+
+    def __len__(self):
+        return len(_known_lines)
+
+    def __contains__(self, key):
+        return key in _known_lines
+
+    def keys(self):
+        return _known_lines.keys()
+
+    def values(self):
+        return [self[key] for key in _known_lines]
+
+    def items(self):
+        return [(key, self[key]) for key in _known_lines]
+
+    def get(self, key, default=None):
+        return self[key] if key in _known_lines else default
+
+
+KNOWN_LINES = LazyLines()
+
+
+def warm():
+    '''
+    Compiles every KNOWN_LINES entry and compiled_* regex now instead of on first use
+    '''
+    for key in _known_lines:
+        KNOWN_LINES[key]
+    for name in _lazy_patterns:
+        compiled(name)
+
+# Directive name (as written in each KNOWN_LINES regex) -> KNOWN_LINES key.
+# Used to pick the candidate regex for a line before running the full match.
+DIRECTIVE_NAMES = {'user-agent': 'user-agent',
+                   'crawl-delay': 'crawl-delay',
+                   'request-rate': 'request-rate',
+                   'allow': 'allow',
+                   'disallow': 'disallow',
+                   'block': 'block',
+                   'noindex': 'noindex',
+                   'nosnippet': 'nosnippet',
+                   'sitemap': 'sitemap',
+                   'host': 'host',
+                   'ignore': 'ignore',
+                   'clean-param': 'clean-param',
+                   'host-loads': 'host-load',
+                   'visit-time': 'visit-time',
+                   'noarchive': 'noarchive',
+                   'nofollow': 'nofollow'
+                   }
@@ -0,0 +1,166 @@
+import re
+from urllib.parse import quote, urlsplit
+
+'''
+URL decisions from a parsed RobotsFile, RFC 9309 style:
+    the crawler's product token picks every group naming it (case insensitive), merged,
+    falling back to the "*" groups, no group at all allows everything
+    the longest matching allow / disallow pattern wins, allow on a tie, nothing matching allows
+    "*" matches any run of characters, a trailing "$" anchors the end of the path
+    /robots.txt is always allowed
+Everything is compiled once per user agent, checking a URL is a handful of dict lookups
+plus at most one regex match for all the wildcard patterns.
+'''
+
+# Chars left alone when normalizing patterns / paths, everything else gets percent encoded
+_SAFE_CHARS = "/?#[]@!$&'()*+,;=:%~-._"
+_needs_quote = re.compile(r"[^A-Za-z0-9/?#\[\]@!$&'()*+,;=:%~\-._]")
+
+
+def normalize(s: str):
+    if _needs_quote.search(s) is None:
+        return s
+    return quote(s, safe=_SAFE_CHARS)
+
+
+def url_path(url: str):
+    # Path (and query) a rule is matched against, paths pass through as is
+    if url.startswith("/"):
+        return normalize(url)
+    scheme_end = url.find("://")
+    if scheme_end < 0:
+        parts = urlsplit(url)
+        path = (parts.path or "/") + ("?" + parts.query if parts.query else "")
+        return normalize(path)
+    # scheme://authority[/path][?query][#fragment], without urlsplit's overhead
+    rest = url[scheme_end + 3:]
+    cuts = [i for i in (rest.find("/"), rest.find("?"), rest.find("#")) if i >= 0]
+    path = rest[min(cuts):].split("#", 1)[0] if cuts else ""
+    if not path.startswith("/"):
+        path = "/" + path
+    return normalize(path)
+
+
+def _wildcard_regex(pattern: str):
+    anchored = pattern.endswith("$")
+    if anchored:
+        pattern = pattern[:-1]
+    body = ".*".join(re.escape(piece) for piece in pattern.split("*"))
+    return body + (r"\Z" if anchored else "")
+
+
+class RuleSet:
+    '''
+    Compiled allow / disallow rules of one user agent.
+    Plain patterns are a prefix table: pattern -> allow, probed once per distinct pattern
+    length (longest first) with a slice of the path. Patterns with "*" / "$" are compiled
+    into one regex, an alternation ordered longest first (allow first within a length),
+    so its match is the wildcard pattern that wins.
+    '''
+
+    def __init__(self, rules):
+        self.prefixes = dict()
+        wildcards = dict()
+        for allow, pattern in rules:
+            pattern = normalize(pattern.strip())
+            if not pattern:
+                # Empty allow / disallow don't match anything
+                continue
+            table = wildcards if "*" in pattern or pattern.endswith("$") else self.prefixes
+            # Allow wins a tie
+            table[pattern] = table.get(pattern, False) or allow
+        self.lengths = sorted({len(p) for p in self.prefixes}, reverse=True)
+        ordered = sorted(wildcards.items(), key=lambda w: (-len(w[0]), not w[1]))
+        # (length, allow) per alternative of the wildcard regex, by group number
+        self.wildcards = [None] + [(len(p), allow) for p, allow in ordered]
+        self.wildcard_match = None
+        if ordered:
+            self.wildcard_match = re.compile("|".join(f"({_wildcard_regex(p)})" for p, allow in ordered),
+                                             re.DOTALL).match
+
+    def allowed(self, path: str):
+        if path == "/robots.txt":
+            return True
+        best_len = -1
+        best_allow = True
+        prefixes = self.prefixes
+        n = len(path)
+        for length in self.lengths:
+            # Longer patterns can't match, path[:length] would just be the whole path
+            if length > n:
+                continue
+            allow = prefixes.get(path[:length])
+            if allow is not None:
+                best_len, best_allow = length, allow
+                break
+        if self.wildcard_match is not None:
+            m = self.wildcard_match(path)
+            if m is not None:
+                length, allow = self.wildcards[m.lastindex]
+                # Allow wins a tie
+                if length > best_len or (length == best_len and allow):
+                    best_allow = allow
+        return best_allow
+
+    def allowed_many(self, paths):
+        allowed = self.allowed
+        return [allowed(path) for path in paths]
+
+
+ALLOW_ALL = RuleSet(())
+
+
+class RobotsMatcher:
+    '''
+    Built once from a RobotsFile, answers can_fetch for any user agent.
+    include_guessed also takes directives the parser only guessed (Disalow: /x, ...)
+    '''
+
+    def __init__(self, groups):
+        # [(set of lower case product tokens, [(allow, pattern), ...]), ...] in file order
+        self.groups = groups
+        self._rule_sets = dict()
+
+    @staticmethod
+    def from_robots(robots, include_guessed=False):
+        groups = []
+        current = None
+        in_rules = False
+        for dirID in sorted(robots.directives):
+            d = robots.directives[dirID]
+            value = d.value if isinstance(d.value, dict) else dict()
+            if d.directive == "user-agent":
+                token = value.get("token") if d.compliance else value.get("matched")
+                if token is None or not (d.compliance or include_guessed):
+                    continue
+                # A user-agent line after rules starts the next group
+                if current is None or in_rules:
+                    current = (set(), [])
+                    groups.append(current)
+                    in_rules = False
+                current[0].add(token.strip().lower())
+            elif d.directive in ("allow", "disallow") and (d.compliance or include_guessed):
+                pattern = value.get("path") if d.compliance else value.get("matched")
+                # Rules before the first user-agent line don't belong to anyone
+                if current is None or pattern is None:
+                    continue
+                in_rules = True
+                current[1].append((d.directive == "allow", pattern))
+        return RobotsMatcher(groups)
+
+    def rule_set(self, user_agent: str):
+        token = user_agent.strip().lower()
+        rule_set = self._rule_sets.get(token)
+        if rule_set is None:
+            rules = [rule for tokens, groupRules in self.groups if token in tokens for rule in groupRules]
+            if not rules and not any(token in tokens for tokens, groupRules in self.groups):
+                rules = [rule for tokens, groupRules in self.groups if "*" in tokens for rule in groupRules]
+            rule_set = self._rule_sets[token] = RuleSet(rules) if rules else ALLOW_ALL
+        return rule_set
+
+    def can_fetch(self, user_agent: str, url: str):
+        return self.rule_set(user_agent).allowed(url_path(url))
+
+    def can_fetch_many(self, user_agent: str, urls):
+        # One user agent lookup for the whole batch
+        return self.rule_set(user_agent).allowed_many([url_path(url) for url in urls])
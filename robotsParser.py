@@ -1,19 +1,78 @@
 import argparse
+import io
+import re
 import os.path
 
 import RobotsDataClasses
 import rfcRegexes
+import runManifest
+import jsonlIndex
+import outputWriter
+import columnarExport
+import archiveInput
+import dirWalker
+import contentSniff
+import parseCache
+import snapshotTimeline
+import invertedIndex
+import corpusStats
+import instrumentation
+import guessCache
+import lineCache
 import logging
-import coloredlogs
 import datetime
 import reMe
 from urllib.parse import urlparse
 import Levenshtein
 import json
 import sys
+import signal
+import time
+import cProfile
+import threading
+from itertools import count
+from collections import Counter
+from typing import NamedTuple, Optional
+import multiprocessing
 
 logger = logging.getLogger(__name__)
-coloredlogs.install(level='debug')
+
+# Raw directive token -> distance_guess, the same typos show up over and over
+guess_cache = guessCache.GuessCache()
+# Line text -> LineResult, template lines (User-agent: *, Disallow: /wp-admin/, ...) are everywhere
+line_cache = lineCache.LineCache()
+# contentSniff verdict -> files
+sniff_counts = Counter()
+# Content hash -> parsed result across runs, with --parse-cache
+parse_cache = None
+
+
+class WorkerOptions(NamedTuple):
+    '''
+    What init_worker sets a process up with (the main process and every pool worker)
+    '''
+    guessCacheSize: int = guessCache.DEFAULT_MAXSIZE
+    # Loaded into the guess cache, and new guesses sent back to be saved to saveGuessTable
+    guessTable: Optional[str] = None
+    saveGuessTable: Optional[str] = None
+    lineCacheSize: int = lineCache.DEFAULT_MAXSIZE
+    jsonBackend: str = "json"
+    jsonOutput: bool = True
+    columnarOutput: bool = False
+    classifyOnly: bool = False
+    # Bytes sniffed ahead of parsing (0 is off), emit a metadata only record for sniffed files
+    sniffContent: int = 0
+    sniffRecord: bool = False
+    parseCachePath: Optional[str] = None
+    # Hand invertedIndex.postings back with every file, with --inverted-index
+    invertedIndexOutput: bool = False
+    # Hand corpusStats.file_observations back with every file, with --stats
+    statsOutput: bool = False
+    # Timing wrappers in, with --instrument
+    instrument: bool = False
+
+
+options = WorkerOptions()
 
 
 def parse_cmd():
@@ -73,6 +132,219 @@ def parse_cmd():
                         default="/tmp/unknownClass.txt",
                         help="output file to store files that are not classifiable for further inquiry",
                         dest="uclass")
+    parser.add_argument("--encoding-class",
+                        required=False,
+                        default="/tmp/encodingClass.txt",
+                        help="output file to store files --sniff found not to be UTF-8 text",
+                        dest="encclass")
+    # Directory input
+    parser.add_argument("--include",
+                        required=False,
+                        action="append",
+                        default=None,
+                        help="glob of files to parse in a -f directory (repeatable), a glob with a / matches the path relative to it",
+                        dest="include")
+    parser.add_argument("--exclude",
+                        required=False,
+                        action="append",
+                        default=None,
+                        help="glob of files / subdirectories to skip in a -f directory (repeatable)",
+                        dest="exclude")
+    parser.add_argument("--min-size",
+                        required=False,
+                        type=int,
+                        default=None,
+                        help="skip files in a -f directory smaller than this many bytes",
+                        dest="minSize")
+    parser.add_argument("--max-size",
+                        required=False,
+                        type=int,
+                        default=None,
+                        help="skip files in a -f directory bigger than this many bytes",
+                        dest="maxSize")
+    parser.add_argument("--archive",
+                        required=False,
+                        choices=("auto", "none") + archiveInput.KINDS,
+                        default="auto",
+                        help="read -f as an archive of robots files (member names become filePath), auto detects it, none reads it as one robots file",
+                        dest="archive")
+    parser.add_argument("--errors",
+                        required=False,
+                        default="/tmp/errorFiles.txt",
+                        help="output file to store files that failed to parse, with the error",
+                        dest="errclass")
+    parser.add_argument("--index",
+                        required=False,
+                        default=None,
+                        help="sidecar index (filePath / domain / date -> byte offset, length) for the -o output, see jsonlIndex",
+                        dest="index")
+    parser.add_argument("--timeline",
+                        required=False,
+                        default=None,
+                        help="once done, write the -o output as per domain snapshot diffs to this file, see snapshotTimeline",
+                        dest="timeline")
+    parser.add_argument("--replace-output",
+                        required=False,
+                        help="with --timeline, remove the -o output and its --index once the timeline is written, "
+                             "merging an existing timeline in instead of rewriting it",
+                        dest="replaceOutput",
+                        action=argparse.BooleanOptionalAction,
+                        default=False)
+    parser.add_argument("--inverted-index",
+                        required=False,
+                        default=None,
+                        help="SQLite index of revealed paths / user agent tokens -> files, see invertedIndex",
+                        dest="invertedIndex")
+    parser.add_argument("--stats",
+                        required=False,
+                        default=None,
+                        help="json file of corpus statistics (counts, distinct / top user agents, paths, ...), see corpusStats",
+                        dest="stats")
+    # Finding out where the time goes
+    parser.add_argument("--instrument",
+                        required=False,
+                        default=None,
+                        help="time / count the hot paths (per stage, per directive), log progress and write a json summary here",
+                        dest="instrument")
+    parser.add_argument("--progress-interval",
+                        required=False,
+                        type=float,
+                        default=10.0,
+                        help="seconds between --instrument progress lines",
+                        dest="progressInterval")
+    parser.add_argument("--count-inputs",
+                        required=False,
+                        help="with --instrument, count a directory's files up front on a background thread (a second "
+                             "walk over it) so the ETA shows from the start, not once the run's own walk is through",
+                        dest="countInputs",
+                        action=argparse.BooleanOptionalAction,
+                        default=False)
+    parser.add_argument("--profile",
+                        required=False,
+                        default=None,
+                        help="run under cProfile (main process only), pstats dump here, per stage times in <file>.stages.json",
+                        dest="profile")
+    # Checkpointing for resumable runs
+    parser.add_argument("--manifest",
+                        required=False,
+                        default=None,
+                        help="progress manifest recording every fully emitted input file",
+                        dest="manifest")
+    parser.add_argument("--resume",
+                        required=False,
+                        help="skip files already in --manifest, rolling back output written after its last checkpoint",
+                        dest="resume",
+                        action=argparse.BooleanOptionalAction,
+                        default=False)
+    # Multi-core corpus mode
+    parser.add_argument("--workers",
+                        required=False,
+                        type=int,
+                        default=1,
+                        help="number of worker processes parsing files, the main process does all the writing",
+                        dest="workers")
+    parser.add_argument("--chunksize",
+                        required=False,
+                        type=int,
+                        default=64,
+                        help="number of files handed to a worker at a time with --workers",
+                        dest="chunksize")
+    parser.add_argument("--ordered",
+                        required=False,
+                        help="with --workers, write results in input order (byte identical to a single worker run)",
+                        dest="ordered",
+                        action=argparse.BooleanOptionalAction,
+                        default=True)
+    # Output buffering
+    parser.add_argument("--flush-bytes",
+                        required=False,
+                        type=int,
+                        default=outputWriter.DEFAULT_FLUSH_BYTES,
+                        help="write buffered output / class file lines out once this many bytes are pending",
+                        dest="flushBytes")
+    parser.add_argument("--flush-interval",
+                        required=False,
+                        type=float,
+                        default=outputWriter.DEFAULT_FLUSH_INTERVAL,
+                        help="write buffered output / class file lines out at least every this many seconds",
+                        dest="flushInterval")
+    parser.add_argument("--json-backend",
+                        required=False,
+                        choices=RobotsDataClasses.JSON_BACKENDS,
+                        default="json",
+                        help="json encoder for the output, orjson (needs the orjson package) is faster but not byte identical to json",
+                        dest="jsonBackend")
+    parser.add_argument("--json",
+                        required=False,
+                        help="write the json output (--no-json to only write class files / --columnar tables)",
+                        dest="jsonOutput",
+                        action=argparse.BooleanOptionalAction,
+                        default=True)
+    parser.add_argument("--classify-only",
+                        required=False,
+                        help="only sort files into the class files, stops reading a file once its class is decided (no json / --columnar)",
+                        dest="classifyOnly",
+                        action=argparse.BooleanOptionalAction,
+                        default=False)
+    parser.add_argument("--sniff",
+                        required=False,
+                        help="look at the start of every file first, html / json / binary / empty files go straight to their class",
+                        dest="sniff",
+                        action=argparse.BooleanOptionalAction,
+                        default=False)
+    parser.add_argument("--sniff-bytes",
+                        required=False,
+                        type=int,
+                        default=contentSniff.DEFAULT_SAMPLE_BYTES,
+                        help="number of bytes (after the wayback header) --sniff looks at",
+                        dest="sniffBytes")
+    parser.add_argument("--sniff-record",
+                        required=False,
+                        help="still write a metadata only json record / --columnar rows for sniffed files",
+                        dest="sniffRecord",
+                        action=argparse.BooleanOptionalAction,
+                        default=False)
+    parser.add_argument("--parse-cache",
+                        required=False,
+                        default=None,
+                        help="sqlite file caching parse results by content hash across runs (wayback header excluded)",
+                        dest="parseCache")
+    # Columnar export for analytics
+    parser.add_argument("--columnar",
+                        required=False,
+                        default=None,
+                        help="directory to write flat directives / comments / urls / paths / classification tables to, "
+                             "rewritten every run (not with --resume)",
+                        dest="columnar")
+    parser.add_argument("--columnar-format",
+                        required=False,
+                        choices=columnarExport.FORMATS,
+                        default=columnarExport.default_format(),
+                        help="format of the --columnar tables, parquet / arrow need pyarrow, rcol is the stdlib fallback",
+                        dest="columnarFormat")
+    # Fuzzy directive guess cache
+    parser.add_argument("--guess-cache-size",
+                        required=False,
+                        type=int,
+                        default=guessCache.DEFAULT_MAXSIZE,
+                        help="max number of directive tokens kept in the fuzzy guess cache (per process)",
+                        dest="guessCacheSize")
+    parser.add_argument("--guess-table",
+                        required=False,
+                        default=None,
+                        help="json table of token -> guessed directive from a previous run to pre-warm the guess cache with",
+                        dest="guessTable")
+    parser.add_argument("--save-guess-table",
+                        required=False,
+                        default=None,
+                        help="file to save the guess cache to at the end of the run, for --guess-table",
+                        dest="saveGuessTable")
+    parser.add_argument("--line-cache-size",
+                        required=False,
+                        type=int,
+                        default=lineCache.DEFAULT_MAXSIZE,
+                        help="max number of classified lines kept in the line cache (per process), 0 turns it off",
+                        dest="lineCacheSize")
 
     return parser.parse_args()
 
@@ -86,6 +358,10 @@ def get_meta_data(wayback: str):
 
 
 def distance_guess(s):
+    return guess_cache.lookup(s, _distance_guess)
+
+
+def _distance_guess(s):
     # Now things get complicated, need to check if it is close enough to
     #   any known directive to confidently declare it as such
     #       Attempt #1: edit distance
@@ -98,9 +374,10 @@ def distance_guess(s):
         elif key == "-sitemap":
             s = s[-len(key):]
         tmp = Levenshtein.ratio(s, key, score_cutoff=0.65)
-        matchingBs = Levenshtein.matching_blocks(Levenshtein.editops(s, key), s, key)
-        matchingBsorted = sorted(matchingBs, key=lambda thing: thing.size, reverse=True)[0]
         if tmp:
+            # Only needed for the tie breaks between candidates over the cutoff
+            matchingBs = Levenshtein.matching_blocks(Levenshtein.editops(s, key), s, key)
+            matchingBsorted = sorted(matchingBs, key=lambda thing: thing.size, reverse=True)[0]
             compList.append((key, tmp, matchingBsorted))
     compList = sorted(compList, key=lambda dist: dist[1], reverse=True)
     # If nothing surpasses our threshold (score_cutoff), return unguessable
@@ -176,6 +453,35 @@ def directive_guess(lineIn):
         return dir_guess, val, tmp[0]
 
 
+# Everything before the first whitespace / "#" of a line, the directive name
+#   (and for *-sitemap the junk prefix) always lives in here
+directive_head = re.compile(r"[ \t]*([^ \t#]*)")
+# Non-ascii chars that re.IGNORECASE matches against ascii letters
+ignorecase_fold = str.maketrans({"İ": "i", "ı": "i", "ſ": "s", "K": "k"})
+KNOWN_LINES_ORDER = {k: i for i, k in enumerate(rfcRegexes.KNOWN_LINES)}
+
+
+def candidate_lines(lineIn):
+    # Cheap tokenizing of the directive name, returns the KNOWN_LINES keys
+    #   whose regex could possibly fullmatch this line (in KNOWN_LINES order)
+    if lineIn[0] == "#":
+        return ("comment",)
+
+    head = directive_head.match(lineIn).group(1).translate(ignorecase_fold).lower()
+    name = head.split(":", maxsplit=1)[0]
+    candidates = []
+    if name in rfcRegexes.DIRECTIVE_NAMES:
+        candidates.append(rfcRegexes.DIRECTIVE_NAMES[name])
+    if "-sitemap" in head:
+        candidates.append("-sitemap")
+    if name.startswith("acap-"):
+        candidates.append("acap-")
+
+    if len(candidates) > 1:
+        candidates.sort(key=KNOWN_LINES_ORDER.__getitem__)
+    return candidates
+
+
 '''
 Input: lineIn (invariant, not empty, and last char is \n
 '''
@@ -185,8 +491,8 @@ def identify_line(lineIn):
     compliant = False
     val = None
     rawDir = None
-    for knownLine, stuffToUnpack in rfcRegexes.KNOWN_LINES.items():
-        reg, ngroups, expectedVal = stuffToUnpack
+    for knownLine in candidate_lines(lineIn):
+        reg, ngroups, expectedVal = rfcRegexes.KNOWN_LINES[knownLine]
         tmp = reMe.fullmatch(reg, lineIn)
         if tmp:
             matchedDir = knownLine
@@ -204,118 +510,191 @@ def identify_line(lineIn):
     return matchedDir, compliant, val, rawDir
 
 
-def parse_robot_file(filename, start=None, end=None, wayback_arg=None):
+'''
+Input: line (not blank, last char is \n)
+Output: immutable LineResult, everything about the Directive for this line except its
+        user agent / ID. Cached per line text, lines repeat a lot across files
+'''
+def classify_line(line):
+    result = line_cache.get(line)
+    if result is None:
+        timeouts_before = sum(reMe.timeouts.values())
+        result = _classify_line(line)
+        # A timed out regex gives a wrong answer, don't keep it around
+        if sum(reMe.timeouts.values()) == timeouts_before:
+            line_cache.put(line, result)
+    return result
 
-    line_number = 0
-        
-    with open(filename, "r") as rIn:
-        if wayback_arg:
-            wayback = rIn.readline().strip()
-            line_number += 1
-            waybackUrl, domain, date = get_meta_data(wayback)
+
+def _classify_line(line):
+    directive, compliant, val, rawDir = identify_line(line)
+
+    raw_line = line
+
+    if directive and compliant:
+        # Was an exact match, grab correct val now
+        ngroups, regMatch = val
+
+        if directive == "comment":
+            raw_directive = "comment"
         else:
-            waybackUrl = f"{filename}"
-            domain = "localhost"
-            date = datetime.datetime.now()
-        robotsObj = RobotsDataClasses.RobotsFile(waybackUrl, date, domain, filename)
-        curUA = None
-        for line in rIn:
-            line_number += 1
+            # Only a handful of spellings, share one string between all the directives using it
+            raw_directive = sys.intern(regMatch["directive"])
+
+        return RobotsDataClasses.LineResult(directive,
+                                            raw_directive,
+                                            tuple((y, raw_directive if y == "directive" else regMatch[y])
+                                                  for y in ngroups),
+                                            regMatch.group(0),
+                                            compliant)
+    elif directive:
+        # This is a guess, gotta be careful about vals and formatting
+        assert(val is None or type(val) == str)
+        if val:
+            assert(val[0] != "#")
+
+
+        dir_val_parsed = {"matched": None, "eolComment": None}
+
+        comments_check = val.split("#", maxsplit=1)
+        if len(comments_check) > 1:
+            # There is a comment somewhere
+            dir_val_parsed["eolComment"] = comments_check[1]
+            val = comments_check[0]
+
+        val = val.strip()
+
+        matchboi = reMe.match(rfcRegexes.KNOWN_LINES[directive][2], val)
+        if matchboi is not None:
+            dir_val_parsed["matched"] = matchboi[0]
+        else:
+            dir_val_parsed["matched"] = matchboi
 
-            if start and end:
-                if line_number <= start:
-                    continue
-                if line_number >= end - 1:
-                    break
+        return RobotsDataClasses.LineResult(directive,
+                                            rawDir,
+                                            tuple(dir_val_parsed.items()),
+                                            raw_line.strip(),
+                                            compliant)
 
-            # Skip blank lines
-            if line.strip():
-                if line[-1] != "\n":
-                    line += "\n"
+    else:
+        dir_val_parsed = {"rawNoComment": None, "eolComment": None}
+        if val:
+            comments_check = val.split("#", maxsplit=1)
+        else:
+            comments_check = []
 
-                directive, compliant, val, rawDir = identify_line(line)
+        if len(comments_check) > 1:
+            # There is a comment somewhere
+            dir_val_parsed["eolComment"] = comments_check[1]
+            dir_val_parsed["rawNoComment"] = comments_check[0]
+        else:
+            dir_val_parsed["rawNoComment"] = raw_line.strip()
 
-                raw_line = line
 
-                if directive and compliant:
-                    # Was an exact match, grab correct val now
-                    # Check if user-agent, to set the new active UA
-                    ngroups, regMatch = val
-                    if directive == "user-agent":
-                        curUA = regMatch["token"]
+        return RobotsDataClasses.LineResult(directive,
+                                            "",
+                                            tuple(dir_val_parsed.items()),
+                                            raw_line.strip(),
+                                            compliant
+                                            )
 
-                    if directive == "comment":
-                        raw_directive = "comment"
-                    else:
-                        raw_directive = regMatch["directive"]
 
-                    d = RobotsDataClasses.Directive(curUA, directive,
-                                                    raw_directive,
-                                                    {y: regMatch[y] for y in ngroups},
-                                                    regMatch.group(0),
-                                                    compliant)
-                elif directive:
-                    # This is a guess, gotta be careful about vals and formatting
-                    assert(val is None or type(val) == str)
-                    if val:
-                        assert(val[0] != "#")
+def robot_lines(rIn, start=None, end=None, line_number=0):
+    # Non blank lines of the file (newline terminated), within the special rules' start / end
+    for line in rIn:
+        line_number += 1
 
+        if start and end:
+            if line_number <= start:
+                continue
+            if line_number >= end - 1:
+                break
 
-                    dir_val_parsed = {"matched": None, "eolComment": None}
+        # Skip blank lines
+        if line.strip():
+            if line[-1] != "\n":
+                line += "\n"
+            yield line
 
-                    comments_check = val.split("#", maxsplit=1)
-                    if len(comments_check) > 1:
-                        # There is a comment somewhere
-                        dir_val_parsed["eolComment"] = comments_check[1]
-                        val = comments_check[0]
 
-                    val = val.strip()
+'''
+RobotsFile with only the metadata, from the wayback header line if there is one
+'''
+def empty_robot_file(filename, wayback=None):
+    if wayback is not None:
+        waybackUrl, domain, date = get_meta_data(wayback)
+    else:
+        waybackUrl = f"{filename}"
+        domain = "localhost"
+        date = datetime.datetime.now()
+    return RobotsDataClasses.RobotsFile(waybackUrl, date, domain, filename)
 
-                    matchboi = reMe.match(rfcRegexes.KNOWN_LINES[directive][2], val)
-                    if matchboi is not None:
-                        dir_val_parsed["matched"] = matchboi[0]
-                    else:
-                        dir_val_parsed["matched"] = matchboi
 
-                    # Hunt for UA
-                    if directive == "user-agent":
-                        curUA = dir_val_parsed["matched"]
+'''
+Text handle on a robots file, data is its content when it came out of an archive
+'''
+def open_robot_file(filename, data=None):
+    if data is not None:
+        # Decoded / newline translated the same way as open(filename, "r")
+        return io.TextIOWrapper(io.BytesIO(data))
+    return open(filename, "r")
+
 
-                    d = RobotsDataClasses.Directive(curUA,
-                                                    directive,
-                                                    rawDir,
-                                                    dir_val_parsed,
-                                                    raw_line.strip(),
-                                                    compliant)
+def parse_robot_file(filename, start=None, end=None, wayback_arg=None, data=None):
 
+    line_number = 0
 
+    # One watchdog timer per file (or per run when called from main) guards every regex call
+    with open_robot_file(filename, data) as rIn, reMe.watchdog():
+        wayback = None
+        if wayback_arg:
+            wayback = rIn.readline().strip()
+            line_number += 1
+        robotsObj = empty_robot_file(filename, wayback)
+        # Directive ID's restart for every file, so they don't depend on which
+        #   files were parsed before it (or in which process)
+        directive_ids = count()
+        curUA = None
+        for line in robot_lines(rIn, start, end, line_number):
+            result = classify_line(line)
 
+            # Check if user-agent, to set the new active UA
+            if result.directive == "user-agent":
+                if result.compliance:
+                    curUA = result.value_dict()["token"]
                 else:
-                    dir_val_parsed = {"rawNoComment": None, "eolComment": None}
-                    if val:
-                        comments_check = val.split("#", maxsplit=1)
-                    else:
-                        comments_check = []
+                    # Hunt for UA
+                    curUA = result.value_dict()["matched"]
 
-                    if len(comments_check) > 1:
-                        # There is a comment somewhere
-                        dir_val_parsed["eolComment"] = comments_check[1]
-                        dir_val_parsed["rawNoComment"] = comments_check[0]
-                    else:
-                        dir_val_parsed["rawNoComment"] = raw_line.strip()
+            robotsObj.add_directive(result.to_directive(curUA, next(directive_ids)))
 
+    return robotsObj
 
-                    d = RobotsDataClasses.Directive(curUA,
-                                                    directive,
-                                                    "",
-                                                    dir_val_parsed,
-                                                    raw_line.strip(),
-                                                    compliant
-                                                    )
 
-                robotsObj.add_directive(d)
+'''
+Same bucket as guess_if_robots(parse_robot_file(...)) without building the RobotsFile,
+lines are only classified (no paths / comments) and reading stops at the first compliant one
+'''
+def classify_robot_file(filename, start=None, end=None, wayback_arg=None, data=None):
+    line_number = 0
+    number_directives = 0
+    number_unknown = 0
 
-    return robotsObj
+    with open_robot_file(filename, data) as rIn, reMe.watchdog():
+        if wayback_arg:
+            # Still checked, a bad header makes the file an error like in a full parse
+            get_meta_data(rIn.readline().strip())
+            line_number += 1
+        for line in robot_lines(rIn, start, end, line_number):
+            result = classify_line(line)
+            if result.compliance:
+                # One compliant directive is enough
+                return "ROBOTS"
+            number_directives += 1
+            if not result.directive:
+                number_unknown += 1
+
+    return robots_bucket(number_directives, 0, number_unknown)
 
 def guess_if_robots(robots_obj: RobotsDataClasses.RobotsFile):
 
@@ -328,7 +707,10 @@ def guess_if_robots(robots_obj: RobotsDataClasses.RobotsFile):
         if dir.directive == 'unknown':
             number_unknown += 1
 
+    return robots_bucket(number_directives, number_compliant, number_unknown)
 
+
+def robots_bucket(number_directives, number_compliant, number_unknown):
     if number_directives > 0:
         if number_compliant > 0:
             return "ROBOTS"
@@ -345,9 +727,164 @@ def guess_if_robots(robots_obj: RobotsDataClasses.RobotsFile):
 
 
 
-def main():
-    args = parse_cmd()
+class FileResult(NamedTuple):
+    filePath: str
+    # guess_if_robots bucket, None if the file failed to parse
+    robotsClass: Optional[str]
+    # RobotsFile.to_json, None if the file failed to parse or json output is off
+    robotsJson: Optional[str]
+    # "ExceptionName: message" if the file failed to parse (e.g. a .swp file)
+    error: Optional[str]
+    # regex timeouts / cache activity, for merge_report
+    report: dict
+    # columnarExport.file_rows, with --columnar
+    rows: Optional[dict] = None
+    # (domain, date isoformat) for the --index / --inverted-index
+    meta: Optional[tuple] = None
+    # invertedIndex.postings, with --inverted-index
+    postings: Optional[tuple] = None
+    # corpusStats.file_observations, with --stats (None for files that weren't parsed)
+    observations: Optional[dict] = None
+
+
+'''
+Output: (class, RobotsFile, its json) the RobotsFile is None when nothing gets written for the
+        file, only has the metadata for a sniffed file / --parse-cache hit without --columnar,
+        the json is None if it wasn't made on the way
+'''
+def analyze_file(full_filename, start=None, end=None, wayback_arg=None, data=None):
+    # Files with special rules only have part of them parsed, leave those alone
+    if options.sniffContent and not (start and end):
+        verdict, header = contentSniff.sniff(full_filename, wayback_arg, options.sniffContent, data)
+        if verdict:
+            sniff_counts[verdict] += 1
+            # Obvious non robots content, bucketed without parsing
+            return contentSniff.BUCKETS[verdict], empty_robot_file(full_filename, header) if options.sniffRecord else None, None
+
+    key = None
+    if parse_cache is not None:
+        key, header = parseCache.content_key(full_filename, wayback_arg, start, end, options.jsonBackend, data)
+        cached = parse_cache.get(key, template=not options.classifyOnly)
+        if cached is not None:
+            # Same body parsed before, only the metadata is new
+            robotsClass, parts = cached
+            if options.classifyOnly:
+                return robotsClass, None, None
+            robots = empty_robot_file(full_filename, header)
+            robotsJson = parseCache.fill_template(parts, robots, options.jsonBackend)
+            if options.columnarOutput or options.invertedIndexOutput or options.statsOutput:
+                robots = RobotsDataClasses.RobotsFile.from_json(json.loads(robotsJson))
+            return robotsClass, robots, robotsJson
+
+    # A timed out regex gives a wrong answer, don't keep it around
+    timeouts_before = sum(reMe.timeouts.values())
+    if options.classifyOnly:
+        robotsClass = classify_robot_file(full_filename, start=start, end=end, wayback_arg=wayback_arg, data=data)
+        if key and sum(reMe.timeouts.values()) == timeouts_before:
+            parse_cache.record(key, robotsClass, None)
+        return robotsClass, None, None
+
+    robots = parse_robot_file(full_filename, start=start, end=end, wayback_arg=wayback_arg, data=data)
+    robotsClass = guess_if_robots(robots)
+    robotsJson = None
+    if key and sum(reMe.timeouts.values()) == timeouts_before:
+        parts = parseCache.json_template(robots, options.jsonBackend)
+        if parts is not None:
+            parse_cache.record(key, robotsClass, parts)
+            robotsJson = parseCache.fill_template(parts, robots, options.jsonBackend)
+    return robotsClass, robots, robotsJson
+
 
+'''
+Input: (filename, start, end, wayback_arg, data) data is the file's content for archive
+       members (None to read filename), runs in the pool workers for --workers > 1
+'''
+def process_file(task):
+    full_filename, start, end, wayback_arg, data = task
+    robotsClass, robotsJson, error, rows, meta, postings, observations = None, None, None, None, None, None, None
+    try:
+        robotsClass, robots, robotsJson = analyze_file(full_filename, start, end, wayback_arg, data)
+        if robots is not None:
+            if options.jsonOutput:
+                if robotsJson is None:
+                    robotsJson = robots.to_json(backend=options.jsonBackend)
+            else:
+                robotsJson = None
+            if options.jsonOutput or options.invertedIndexOutput:
+                meta = (robots.domain, robots.date.isoformat())
+            if options.columnarOutput:
+                rows = columnarExport.file_rows(robots, robotsClass)
+            if options.invertedIndexOutput:
+                postings = invertedIndex.postings(robots)
+            if options.statsOutput:
+                observations = corpusStats.file_observations(robots)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+
+    # Hand this file's regex timeouts / cache activity back to the parent for reporting
+    report = {"timeouts": reMe.timeout_report(),
+              "guesses": guess_cache.pop_new(),
+              "guess_hits": guess_cache.hits,
+              "guess_misses": guess_cache.misses,
+              "line_hits": line_cache.hits,
+              "line_misses": line_cache.misses,
+              "sniffed": dict(sniff_counts)}
+    if parse_cache is not None:
+        report["parse_cache"] = parse_cache.pop_new()
+        report["parse_hits"], report["parse_misses"] = parse_cache.hits, parse_cache.misses
+        parse_cache.hits = parse_cache.misses = 0
+    if instrumentation.enabled:
+        report["instrumentation"] = instrumentation.pop()
+    reMe.reset_timeouts()
+    sniff_counts.clear()
+    guess_cache.hits = guess_cache.misses = 0
+    line_cache.hits = line_cache.misses = 0
+    return FileResult(full_filename, robotsClass, robotsJson, error, report, rows, meta, postings, observations)
+
+
+def init_worker(workerOptions=WorkerOptions()):
+    global guess_cache, line_cache, parse_cache, options
+    options = workerOptions
+    guess_cache = guessCache.GuessCache(options.guessCacheSize)
+    if options.guessTable and os.path.exists(options.guessTable):
+        guess_cache.load(options.guessTable)
+    # New guesses are sent back to the main process to be saved
+    guess_cache.record_new = options.saveGuessTable is not None
+    line_cache = lineCache.LineCache(options.lineCacheSize)
+    parse_cache = parseCache.ParseCache(options.parseCachePath, options.guessTable) if options.parseCachePath else None
+    if options.instrument:
+        instrumentation.install(sys.modules[__name__])
+    if multiprocessing.parent_process() is not None:
+        # Pool worker, compile the regexes before the first file (nothing left to do when
+        #   forked from the warmed up parent), the main process compiles them on first use
+        rfcRegexes.warm()
+
+
+def throttled(tasks, in_flight):
+    # Only hands out a task once in_flight allows it, the consumer releases one per result
+    for task in tasks:
+        in_flight.acquire()
+        yield task
+
+
+def merge_report(report):
+    reMe.timeouts.update(report["timeouts"])
+    guess_cache.warm(report["guesses"])
+    guess_cache.hits += report["guess_hits"]
+    guess_cache.misses += report["guess_misses"]
+    line_cache.hits += report["line_hits"]
+    line_cache.misses += report["line_misses"]
+    sniff_counts.update(report["sniffed"])
+    if "parse_cache" in report:
+        parse_cache.put_many(report["parse_cache"])
+        parse_cache.hits += report["parse_hits"]
+        parse_cache.misses += report["parse_misses"]
+    if "instrumentation" in report:
+        instrumentation.merge(report["instrumentation"])
+
+
+def run(args):
+    started = time.monotonic()
     specialRulesDict = dict()
     if args.specialRules:
         with open(args.specialRules, "r") as specialRulesIn:
@@ -358,56 +895,271 @@ def main():
                     specialRulesDict[file] = [int(start), int(stop)]
 
     group_names = ["EMPTY", "ROBOTS", "NON-EMPTY, NON-ROBOTS",
-                   "NON-EMPTY, NON-ROBOTS, THRESHOLD", "???"]
+                   "NON-EMPTY, NON-ROBOTS, THRESHOLD", "???", "ENCODING"]
     group_meta_files = [args.eclass, args.rclass, args.nenrclass,
-                        args.tclass, args.uclass]
+                        args.tclass, args.uclass, args.encclass]
 
+    archiveKind = None
     if os.path.isdir(args.robotsIn):
-        # proceed as directory
-        directory = args.robotsIn
-        tmp = os.listdir(directory)
-        abs_dir = os.path.abspath(directory)
-        files_to_iterate = [os.path.join(abs_dir, file) for file in tmp if not file.endswith(".json")]
+        # proceed as directory, walked lazily while the files get parsed
+        files_to_iterate = dirWalker.walk(args.robotsIn, args.include, args.exclude, args.minSize, args.maxSize)
 
     elif os.path.isfile(args.robotsIn):
         files_to_iterate = [os.path.abspath(args.robotsIn)]
+        if args.archive == "auto":
+            archiveKind = archiveInput.detect(args.robotsIn)
+        elif args.archive != "none":
+            archiveKind = args.archive
 
     else:
         print(f"What are you doing? Not passing a directory or file to the parser...")
         sys.exit(1)
 
-    for full_filename in files_to_iterate:
-        try:
-            if full_filename in specialRulesDict:
-                robots = parse_robot_file(full_filename,
-                                          start=specialRulesDict[full_filename][0],
-                                          end=specialRulesDict[full_filename][1],
-                                          wayback_arg=args.wayback)
-            else:
-                robots = parse_robot_file(full_filename, wayback_arg=args.wayback)
-        # Happens when a .swp file exists
-        except UnicodeDecodeError:
-            print(f"swp file exists: {full_filename}")
+    if archiveKind and args.inPlace:
+        print(f"--inplace can't write next to the members of a {archiveKind} archive")
+        sys.exit(1)
+
+    if args.classifyOnly:
+        if args.columnar or args.index or args.invertedIndex:
+            print(f"--classify-only doesn't parse files fully, it can't write --columnar / --index / --inverted-index")
             sys.exit(1)
+        args.jsonOutput = False
+
+    if (args.index or args.timeline) and (args.inPlace or not args.jsonOutput or not isinstance(args.outStream, str)):
+        print(f"--index / --timeline need the json output going to a file with -o")
+        sys.exit(1)
+
+    if args.replaceOutput and not args.timeline:
+        print(f"--replace-output only goes with --timeline")
+        sys.exit(1)
+    if args.replaceOutput and args.manifest:
+        print(f"--replace-output removes the -o output, which --resume of a --manifest run needs")
+        sys.exit(1)
+
+    if args.columnar and args.resume:
+        print(f"--columnar tables are rewritten from scratch every run, --resume would drop the rows of the "
+              f"files already done, rerun without --resume")
+        sys.exit(1)
+
+    manifest = None
+    if args.manifest:
+        sinks = group_meta_files + [args.errclass]
+        if not args.inPlace and isinstance(args.outStream, str):
+            sinks.append(args.outStream)
+        if args.index:
+            sinks.append(args.index)
+        manifest = runManifest.RunManifest(args.manifest, sinks, resume=args.resume)
+    elif args.resume:
+        print(f"--resume needs the --manifest of the run to resume")
+        sys.exit(1)
 
-        with open(group_meta_files[group_names.index(guess_if_robots(robots))], "a+") as metaOut:
-            print(full_filename, file=metaOut)
+    if archiveKind:
+        # (member name, content) streamed out of the archive
+        inputs = archiveInput.iter_members(args.robotsIn, archiveKind, args.wayback)
+    else:
+        inputs = ((full_filename, None) for full_filename in files_to_iterate)
+    progress = None
+    if args.instrument:
+        # Counted off the walk the run does anyway, no second pass over the input
+        count_inputs = None
+        if args.countInputs and os.path.isdir(args.robotsIn):
+            count_inputs = dirWalker.walk(args.robotsIn, args.include, args.exclude, args.minSize, args.maxSize)
+        progress = instrumentation.Progress(args.progressInterval, len(manifest.done) if manifest else 0, count_inputs)
+        inputs = progress.counted(inputs)
+    tasks = ((full_filename, *specialRulesDict.get(full_filename, (None, None)), args.wayback, data)
+             for full_filename, data in inputs
+             if not manifest or full_filename not in manifest.done)
+
+    if args.jsonBackend == "orjson" and RobotsDataClasses.orjson is None:
+        print(f"--json-backend orjson needs the orjson package installed")
+        sys.exit(1)
+
+    columnar = None
+    if args.columnar:
+        try:
+            columnar = columnarExport.ColumnarExporter(args.columnar, args.columnarFormat)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
 
-        if args.inPlace:
-            #output in place 
-            with open(f"{full_filename}.json", "w") as jsonOut:
-                print(robots.to_json(), file=jsonOut)
+    worker_options = WorkerOptions(guessCacheSize=args.guessCacheSize, guessTable=args.guessTable,
+                                   saveGuessTable=args.saveGuessTable, lineCacheSize=args.lineCacheSize,
+                                   jsonBackend=args.jsonBackend, jsonOutput=args.jsonOutput,
+                                   columnarOutput=columnar is not None, classifyOnly=args.classifyOnly,
+                                   sniffContent=args.sniffBytes if args.sniff else 0, sniffRecord=args.sniffRecord,
+                                   parseCachePath=args.parseCache, invertedIndexOutput=args.invertedIndex is not None,
+                                   statsOutput=args.stats is not None, instrument=args.instrument is not None)
+    in_flight = None
+    if args.workers > 1:
+        # The pool pulls tasks off the iterator as fast as it can, cap how many are
+        #   ahead of the results so archive members don't pile up in memory
+        in_flight_limit = 4 * args.workers * args.chunksize
+        in_flight = threading.Semaphore(in_flight_limit)
+        tasks = throttled(tasks, in_flight)
+        # Compiled once here, forked workers inherit them
+        rfcRegexes.warm()
+        pool = multiprocessing.Pool(args.workers, initializer=init_worker, initargs=(worker_options,))
+        if args.ordered:
+            results = pool.imap(process_file, tasks, chunksize=args.chunksize)
         else:
-            if isinstance(args.outStream, str):
-                with open(args.outStream, "a+") as fout:
-                    print(robots.to_json(), file=fout)
-            else:
-                print(robots.to_json())
+            results = pool.imap_unordered(process_file, tasks, chunksize=args.chunksize)
+    else:
+        pool = None
+        results = map(process_file, tasks)
+    # After forking, the workers open their own parse cache connection
+    init_worker(worker_options)
+    # Workers only extract postings, the index is written here
+    inverted = invertedIndex.InvertedIndex(args.invertedIndex) if args.invertedIndex else None
+
+    # Turn SIGTERM into a normal exit so buffered output still gets written
+    #   (installed after the pool forked, workers keep the default)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
+    writer = outputWriter.OutputWriter(args.flushBytes, args.flushInterval)
+    if manifest:
+        # Checkpoint files only once their lines are on disk
+        writer.after_flush.append(manifest.flush)
+    if parse_cache:
+        writer.after_flush.append(parse_cache.commit)
+    if inverted:
+        writer.after_flush.append(inverted.commit)
+    stats = None
+    if args.stats:
+        # A resumed run picks up the stats of everything its manifest checkpointed
+        stats = corpusStats.CorpusStats.load(args.stats) if manifest and args.resume and os.path.exists(args.stats) \
+            else corpusStats.CorpusStats()
+        if manifest:
+            # Saved along with every checkpoint, so they always cover the same files
+            writer.after_flush.append(lambda: stats.save(args.stats))
+    files_done = 0
+    errors = 0
+
+    # One watchdog timer for the whole run instead of an alarm per regex call
+    #   (pool workers arm their own per file)
+    try:
+        with writer, reMe.watchdog():
+            for full_filename, robotsClass, robotsJson, error, report, rows, meta, postings, observations in results:
+                if in_flight:
+                    in_flight.release()
+                merge_report(report)
+                files_done += 1
+                if progress:
+                    progress.update(files_done)
+
+                # Quarantine files that failed (e.g. .swp files) instead of stopping the run
+                if error is not None:
+                    logger.error(f"Failed to parse {full_filename}: {error}")
+                    writer.write(args.errclass, f"{full_filename}\t{error}")
+                    errors += 1
+                    if stats:
+                        stats.add_error()
+                    if manifest:
+                        manifest.record(full_filename, "error", {args.errclass: writer.sizes[args.errclass]})
+                    continue
 
+                metaFile = group_meta_files[group_names.index(robotsClass)]
+                writer.write(metaFile, full_filename)
+                # Sink sizes after this file's writes, for the manifest
+                sizes = {metaFile: writer.sizes[metaFile]}
+
+                if columnar and rows:
+                    columnar.add_rows(rows)
+                if inverted and postings:
+                    inverted.add(full_filename, *meta, postings)
+                if stats:
+                    stats.add_file(robotsClass, observations)
+
+                if not args.jsonOutput or robotsJson is None:
+                    # json off, or a --sniff'd file without --sniff-record
+                    pass
+                elif args.inPlace:
+                    #output in place 
+                    with open(f"{full_filename}.json", "w") as jsonOut:
+                        print(robotsJson, file=jsonOut)
+                else:
+                    if isinstance(args.outStream, str):
+                        offset = writer.write(args.outStream, robotsJson)
+                        sizes[args.outStream] = writer.sizes[args.outStream]
+                        if args.index:
+                            # Record length without the newline
+                            writer.write(args.index, jsonlIndex.index_line(full_filename, *meta, offset,
+                                                                           sizes[args.outStream] - offset - 1))
+                            sizes[args.index] = writer.sizes[args.index]
+                    else:
+                        print(robotsJson)
+
+                if manifest:
+                    manifest.record(full_filename, "ok", sizes)
+        if pool:
+            pool.close()
+            pool.join()
+    finally:
+        if columnar:
+            columnar.close()
+        if pool:
+            # Unblock the pool's task feeder so terminate can join it
+            in_flight.release(in_flight_limit)
+            pool.terminate()
+        if manifest:
+            manifest.close()
+        if parse_cache:
+            parse_cache.commit()
+        if inverted:
+            inverted.commit()
+
+    if args.saveGuessTable:
+        guess_cache.save(args.saveGuessTable)
+    logger.info(f"Directive guess cache: {guess_cache.stats()}")
+    logger.info(f"Line cache: {line_cache.stats()}")
+    if args.sniff:
+        logger.info(f"Sniffed files: {dict(sniff_counts)}")
+    if parse_cache:
+        logger.info(f"Parse cache: {parse_cache.stats()}")
+        parse_cache.close()
+
+    if args.instrument:
+        summary = instrumentation.summary(files_done, errors, time.monotonic() - started)
+        with open(args.instrument, "w") as summaryOut:
+            json.dump(summary, summaryOut, indent=1)
+        logger.info(f"{files_done} files in {summary['elapsed']:,.1f}s ({summary['files_per_s']:,.1f} files/s, "
+                    f"{summary['lines_per_s']:,.0f} lines/s), summary in {args.instrument}")
+
+    if stats:
+        stats.save(args.stats)
+        logger.info(f"Corpus stats: {stats.files} files, {stats.errors} errors, written to {args.stats}")
+    if inverted:
+        logger.info(f"Inverted index: {inverted.stats()}")
+        inverted.close()
+
+    if args.timeline:
+        snapshots = snapshotTimeline.write_timeline(args.outStream, args.timeline, args.index,
+                                                    replace=args.replaceOutput)
+        logger.info(f"Wrote {snapshots} snapshots to the timeline {args.timeline}"
+                    f"{f', in place of {args.outStream}' if args.replaceOutput else ''}")
+
+    # Regex calls that hit reMe.TIMEOUT returned None, make sure that's visible
+    for call_site, n in reMe.timeout_report().items():
+        logger.warning(f"{n} regex call(s) timed out at {call_site}")
 
     return 0
 
 
+def main():
+    # Only when run as a script, importing this module leaves logging alone
+    import coloredlogs
+    coloredlogs.install(level='debug')
+    args = parse_cmd()
+    if not args.profile:
+        return run(args)
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(run, args)
+    finally:
+        profiler.dump_stats(args.profile)
+        with open(f"{args.profile}.stages.json", "w") as stagesOut:
+            json.dump(instrumentation.profile_stages(profiler), stagesOut, indent=1)
+
+
 
 
 if __name__ == "__main__":
@@ -0,0 +1,73 @@
+import json
+import os
+
+'''
+Checkpoint manifest for corpus runs, one json record per line:
+    {"sizes": {sink: bytes}}                                        at the start of every run
+    {"file": path, "status": "ok"|"error", "sizes": {sink: bytes}}  once a file is fully emitted
+"sizes" are the sink file sizes right after that record's writes, anything past the
+last recorded size was written by a run that died before checkpointing it.
+File records are held back until flush(), call it only once the sinks are flushed
+'''
+
+
+class RunManifest:
+    def __init__(self, path, sinks, resume=False):
+        self.path = path
+        self.done = set()
+        self._pending = []
+
+        if resume and os.path.exists(path):
+            self._rollback(self._load())
+            mode = "a"
+        else:
+            mode = "w"
+
+        self._out = open(path, mode)
+        if mode == "a" and self._out.tell() > 0:
+            # Start on a fresh line in case the last run died mid record
+            with open(path, "rb") as manifestIn:
+                manifestIn.seek(-1, os.SEEK_END)
+                if manifestIn.read(1) != b"\n":
+                    self._out.write("\n")
+        self._write({"sizes": {sink: os.path.getsize(sink) if os.path.exists(sink) else 0 for sink in sinks}})
+        self._out.flush()
+
+    def _load(self):
+        sizes = dict()
+        with open(self.path, "r") as manifestIn:
+            for line in manifestIn:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Partial last line from a run that died mid write
+                    continue
+                sizes.update(record["sizes"])
+                if "file" in record:
+                    self.done.add(record["file"])
+        return sizes
+
+    @staticmethod
+    def _rollback(sizes):
+        # Drop anything emitted after the last checkpoint, it gets redone
+        for sink, size in sizes.items():
+            if os.path.exists(sink) and os.path.getsize(sink) > size:
+                with open(sink, "r+b") as sinkOut:
+                    sinkOut.truncate(size)
+
+    def _write(self, record):
+        print(json.dumps(record), file=self._out)
+
+    def record(self, filename, status, sizes):
+        self.done.add(filename)
+        self._pending.append({"file": filename, "status": status, "sizes": sizes})
+
+    def flush(self):
+        for record in self._pending:
+            self._write(record)
+        self._pending.clear()
+        self._out.flush()
+
+    def close(self):
+        self.flush()
+        self._out.close()
@@ -0,0 +1,246 @@
+import argparse
+import difflib
+import json
+import os
+import sys
+from datetime import datetime
+
+import RobotsDataClasses
+import jsonlIndex
+
+'''
+Per domain timeline of the -o jsonl output, one json line per snapshot, oldest first per domain:
+    {"domain", "date", "wayback_url", "filePath", "directives": [directive, ...]}   full version
+    {"domain", "date", "wayback_url", "filePath", "diff": [[op, arg], ...]}         change to the previous one
+directives are the RobotsFile directives in id order without their "id", diff ops walk the
+previous version's directives: ["=", n] keep n, ["-", n] drop n, ["+", [directive, ...]] add.
+Everything else in a RobotsFile (user agents, comments, paths) comes from the directives again.
+'''
+
+DEFAULT_KEYFRAME_INTERVAL = 64
+
+
+def parse_cmd():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--input",
+                        required=True,
+                        help="jsonl output of robotsParser.py -o",
+                        dest="jsonIn")
+    parser.add_argument("--index",
+                        required=False,
+                        default=None,
+                        help="its --index sidecar, built (next to the input) if there isn't one",
+                        dest="index")
+    parser.add_argument("-o", "--output",
+                        required=True,
+                        help="file to write the timeline to",
+                        dest="timelineOut")
+    parser.add_argument("--keyframe-interval",
+                        required=False,
+                        type=int,
+                        default=DEFAULT_KEYFRAME_INTERVAL,
+                        help="write a domain's full version every this many snapshots (0 only the first), bounds reconstruct work",
+                        dest="keyframeInterval")
+    parser.add_argument("--replace",
+                        required=False,
+                        default=False,
+                        action=argparse.BooleanOptionalAction,
+                        help="remove the input and its index once the timeline is written (it holds the same records), "
+                             "merging an existing timeline at -o in instead of rewriting it",
+                        dest="replace")
+    return parser.parse_args()
+
+
+def record_directives(record: dict):
+    # Directives of a decoded output record, in id order without the id
+    directives = []
+    for dirID in sorted(record["directives"], key=int):
+        d = dict(record["directives"][dirID])
+        del d["id"]
+        directives.append(d)
+    return directives
+
+
+def diff_directives(old: list, new: list):
+    a = [json.dumps(d) for d in old]
+    b = [json.dumps(d) for d in new]
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            ops.append(["=", i2 - i1])
+            continue
+        if i2 > i1:
+            ops.append(["-", i2 - i1])
+        if j2 > j1:
+            ops.append(["+", new[j1:j2]])
+    return ops
+
+
+def apply_diff(old: list, ops: list):
+    new = []
+    i = 0
+    for op, arg in ops:
+        if op == "=":
+            new += old[i:i + arg]
+            i += arg
+        elif op == "-":
+            i += arg
+        else:
+            new += arg
+    return new
+
+
+def rebuild(entry: dict, directives: list):
+    '''
+    RobotsFile of a timeline entry from its directives, the same as the output record it came from
+    '''
+    robots = RobotsDataClasses.RobotsFile(entry["wayback_url"], datetime.fromisoformat(entry["date"]),
+                                          entry["domain"], entry["filePath"])
+    for dirID, d in enumerate(directives):
+        # add_directive marks unguessable directives as unknown itself
+        directive = None if d["directive"] == "unknown" else d["directive"]
+        robots.add_directive(RobotsDataClasses.Directive(d["user_agent"], directive, d["raw_directive"],
+                                                         d["value"], d["raw_value"], d["compliance"], dirID))
+    return robots
+
+
+def _merged_snapshots(records, timeline, domain):
+    # [(entry without its directives / diff, directives), ...] of the domain oldest first, from
+    #   the timeline and the output, the output's record wins for a filePath in both
+    merged = dict()
+    if timeline is not None:
+        for entry, directives in timeline.iter_directives(domain):
+            merged[entry["filePath"]] = (entry, directives)
+    for date, offset, length in records.snapshots(domain):
+        record = json.loads(records.raw(offset, length))
+        entry = {"domain": domain, "date": record["date"],
+                 "wayback_url": record["wayback_url"], "filePath": record["filePath"]}
+        merged[record["filePath"]] = (entry, record_directives(record))
+    return sorted(merged.values(), key=lambda snapshot: snapshot[0]["date"])
+
+
+def write_timeline(json_path, out_path, idx_path=None, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
+                   replace=False):
+    '''
+    Writes the timeline of the json_path output to out_path, returns the number of snapshots.
+    replace removes the output and its index once the timeline is written, and merges a
+    timeline already at out_path in first, so runs that each replace their output add up
+    in one timeline. Without it an existing timeline is rewritten from the output alone.
+    '''
+    idx_path = idx_path or jsonlIndex.index_path(json_path)
+    # An index left over from an earlier output at the same path would point at the wrong bytes
+    if not jsonlIndex.index_matches(json_path, idx_path):
+        jsonlIndex.build_index(json_path, idx_path)
+
+    timeline = Timeline(out_path) if replace and os.path.exists(out_path) else None
+    # Written next to out_path and moved over it at the end, a run that dies leaves the old timeline
+    tmp_path = f"{out_path}.tmp"
+    snapshots = 0
+    try:
+        with jsonlIndex.IndexedJsonl(json_path, idx_path) as records, open(tmp_path, "w") as timelineOut:
+            domains = set(records.by_domain) | (set(timeline.by_domain) if timeline else set())
+            for domain in sorted(domains):
+                previous = None
+                for n, (entry, directives) in enumerate(_merged_snapshots(records, timeline, domain)):
+                    if previous is None or (keyframe_interval and n % keyframe_interval == 0):
+                        entry["directives"] = directives
+                    else:
+                        entry["diff"] = diff_directives(previous, directives)
+                    print(json.dumps(entry), file=timelineOut)
+                    previous = directives
+                    snapshots += 1
+    finally:
+        if timeline:
+            timeline.close()
+    os.replace(tmp_path, out_path)
+
+    if replace:
+        os.remove(json_path)
+        os.remove(idx_path)
+    return snapshots
+
+
+class Timeline:
+    '''
+    Reads a timeline back, snapshot(domain, date) rebuilds one RobotsFile by walking
+    forward from the closest full version before it
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        # domain -> [(date, offset, full version), ...] in timeline order
+        self.by_domain = dict()
+        with open(path, "rb") as timelineIn:
+            offset = 0
+            for line in timelineIn:
+                entry = json.loads(line)
+                self.by_domain.setdefault(entry["domain"], []).append((entry["date"], offset, "directives" in entry))
+                offset += len(line)
+        self._in = open(path, "rb")
+
+    def _entry(self, offset):
+        self._in.seek(offset)
+        return json.loads(self._in.readline())
+
+    def dates(self, domain):
+        return [date for date, offset, full in self.by_domain.get(domain, [])]
+
+    def changes(self, domain):
+        # (date, diff ops) of every snapshot after the first, without rebuilding anything
+        for date, offset, full in self.by_domain.get(domain, [])[1:]:
+            entry = self._entry(offset)
+            yield date, entry.get("diff")
+
+    def iter_directives(self, domain):
+        # (entry without its directives / diff, directives) of every snapshot, oldest first
+        directives = None
+        for date, offset, full in self.by_domain.get(domain, []):
+            entry = self._entry(offset)
+            directives = entry.pop("directives") if full else apply_diff(directives, entry.pop("diff"))
+            yield entry, directives
+
+    def iter_snapshots(self, domain):
+        for entry, directives in self.iter_directives(domain):
+            yield rebuild(entry, directives)
+
+    def snapshot(self, domain, date=None):
+        '''
+        The domain's snapshot from date (datetime or isoformat string, latest one at or
+        before it), the newest one without a date, None if there isn't one
+        '''
+        entries = self.by_domain.get(domain, [])
+        if isinstance(date, datetime):
+            date = date.isoformat()
+        if date is not None:
+            entries = [e for e in entries if e[0] <= date]
+        if not entries:
+            return None
+
+        start = max(i for i, e in enumerate(entries) if e[2])
+        directives = None
+        for date, offset, full in entries[start:]:
+            entry = self._entry(offset)
+            directives = entry["directives"] if full else apply_diff(directives, entry["diff"])
+        return rebuild(entry, directives)
+
+    def close(self):
+        self._in.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    args = parse_cmd()
+    size = os.path.getsize(args.jsonIn)
+    snapshots = write_timeline(args.jsonIn, args.timelineOut, args.index, args.keyframeInterval, args.replace)
+    print(f"{snapshots} snapshots, {size} -> {os.path.getsize(args.timelineOut)} bytes"
+          f"{', input removed' if args.replace else ''}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
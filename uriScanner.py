@@ -0,0 +1,93 @@
+import re
+
+import rfcRegexes
+
+'''
+Linear time RobotsFile.extract_uris, the same results as running
+    findall / sub of rfcRegexes.compiled_no_scheme_uri (bare domains)
+    then findall / sub of rfcRegexes.compiled_absuri (scheme uris) on what's left
+Both regexes are retried by findall at every position of a run of domain / scheme chars
+and scan to its end each time, quadratic in the run length (long comment / HTML lines,
+where reMe's timeout kicks in and drops them). Here every run is looked at once:
+    a bare domain is the longest chain of 2+ labels ([a-zA-Z0-9-]+) joined by single dots
+    from the start of a label, with the spaces / tabs around it (the ones before only if
+    the last match didn't take them)
+    a scheme uri starts at the first letter of a run of scheme chars followed by ":",
+    the rest (hier-part, query) is the absuri regex itself, anchored there
+'''
+
+# 2+ labels joined by single dots, only tried where a label starts
+_domain = re.compile(r"(?<![a-zA-Z0-9\-])[a-zA-Z0-9\-]+(?:\.[a-zA-Z0-9\-]+)+")
+# Run of scheme chars ending in ":", group 1 is the scheme (from its first letter)
+_scheme_run = re.compile(r"(?<![a-zA-Z0-9+\-.])[0-9+\-.]*([a-zA-Z][a-zA-Z0-9+\-.]*):")
+_scheme_run_here = re.compile(r"[0-9+\-.]*([a-zA-Z][a-zA-Z0-9+\-.]*):")
+_scheme_chars = re.compile(r"[a-zA-Z0-9+\-.]*")
+_ws = re.compile(r"[ \t]*")
+_ws_chars = " \t"
+
+
+def find_domains(s: str):
+    '''
+    Output: [(start, end), ...] of the compiled_no_scheme_uri matches of s, spaces / tabs included
+    '''
+    spans = []
+    consumed = 0
+    for m in _domain.finditer(s):
+        start, end = m.span()
+        # Spaces / tabs on both sides, the ones before unless the last match took them
+        while start > consumed and s[start - 1] in _ws_chars:
+            start -= 1
+        end = _ws.match(s, end).end()
+        spans.append((start, end))
+        consumed = end
+    return spans
+
+
+def find_scheme_uris(s: str):
+    '''
+    Output: [(start, end), ...] of the compiled_absuri matches of s
+    '''
+    spans = []
+    pos = 0
+    # findall goes on right where the last uri stopped, which can be inside a run of scheme chars
+    resume = False
+    while True:
+        if resume and _scheme_chars.match(s, pos).end() > pos:
+            m = _scheme_run_here.match(s, pos)
+            if m is None:
+                pos = _scheme_chars.match(s, pos).end()
+                resume = False
+                continue
+        else:
+            m = _scheme_run.search(s, pos)
+            if m is None:
+                break
+        # absuri after "scheme:", it only backtracks inside (userinfo@)? and the bounded ip literal
+        end = rfcRegexes.compiled_absuri_after_scheme.match(s, m.end()).end()
+        spans.append((m.start(1), end))
+        pos = end
+        resume = True
+    return spans
+
+
+def _cut(s: str, spans):
+    # s[start:end] of every span, and s with each of them replaced by a space (re.sub(..., " ", s))
+    found = []
+    parts = []
+    last = 0
+    for start, end in spans:
+        found.append(s[start:end])
+        parts.append(s[last:start])
+        parts.append(" ")
+        last = end
+    parts.append(s[last:])
+    return found, "".join(parts)
+
+
+def extract_uris(s: str):
+    '''
+    Output: (bare domains + scheme uris, s without them), as RobotsFile.extract_uris
+    '''
+    noschemes, cleaned_s = _cut(s, find_domains(s))
+    withschemes, cleaned_s = _cut(cleaned_s, find_scheme_uris(cleaned_s))
+    return noschemes + withschemes, cleaned_s